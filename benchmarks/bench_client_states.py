@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+# Cost of the client side DaemonStates machine (SynAck -> Ack -> Done) that
+# tmux_pytimer.py runs for every command.
+#
+# The daemon's replies are written into one end of a socketpair ahead of
+# time and the states are driven on the other end, so only frame parsing and
+# the state transitions are measured. Creating the socketpair is timed on its
+# own as a baseline since Done closes the socket.
+#
+#   python3 benchmarks/bench_client_states.py [-n CYCLES]
+
+import io
+import os
+import sys
+import time
+import socket
+import argparse
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, f"{ROOT}/pytimer_pckg")
+
+from pytimer import DaemonStates, Protocol
+
+STATUS = "#[fg=#282828]#[bg=#427b58]#[bold]  1/3 42m "
+
+
+def run_states(blocking, replies):
+    client, server = socket.socketpair()
+    server.sendall(replies)
+
+    if blocking:
+        state = DaemonStates.SynAck(client)
+    else:
+        state = DaemonStates.Ack(client)
+
+    while str(state) != "Done":
+        state = state.next()
+
+    server.close()
+
+    return state.value
+
+
+def baseline(blocking, replies):
+    client, server = socket.socketpair()
+    server.sendall(replies)
+    client.close()
+    server.close()
+
+
+def bench(name, cycles, func, *args):
+    # Ack prints the reply values, as tmux_pytimer.py does
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for _ in range(cycles):
+            func(*args)
+        elapsed = time.perf_counter() - start
+
+    print(f"{name:<24}{cycles / elapsed:>14.0f}{elapsed / cycles * 1e6:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--cycles", type=int, default=50000, help="Number of state machine runs per case")
+    args = parser.parse_args()
+
+    ack = Protocol.encode_frame(Protocol.ACK, 0, Protocol.encode_values([STATUS]))
+    syn_ack = Protocol.encode_frame(Protocol.SYN_ACK, 0)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        value = run_states(True, syn_ack + ack)
+
+    if value != [STATUS]:
+        raise Exception("The state machine did not return the status")
+
+    print(f"{'case':<24}{'cycles/s':>14}{'us/cycle':>10}")
+    bench("socketpair only", args.cycles, baseline, False, ack)
+    bench("Ack -> Done", args.cycles, run_states, False, ack)
+    bench("SynAck -> Ack -> Done", args.cycles, run_states, True, syn_ack + ack)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+# End to end load test of the daemon socket protocol.
+#
+# Starts the real daemon in a sandbox (see harness.py) and runs CLIENTS
+# client processes for DURATION seconds. Each request does what
+# tmux_pytimer.py does: connect, send one framed request, wait for the
+# reply and close. Commands are drawn from a weighted mix of STATUS, LIST,
+# START and PAUSE on random timers. Reports p50/p99 latency per command,
+# overall throughput and the daemon's CPU time and memory.
+#
+#   python3 benchmarks/bench_daemon_load.py [-c CLIENTS] [-d SECONDS] [-t TIMERS]
+#                                           [--mix STATUS=90,LIST=2,START=4,PAUSE=4]
+
+import os
+import sys
+import time
+import random
+import socket
+import argparse
+import statistics
+import multiprocessing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, f"{ROOT}/pytimer_pckg")
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+from pytimer import Protocol
+from harness import DaemonSandbox
+
+
+def request(socket_path, cmd, timer=None):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(30)
+
+    try:
+        client.connect(socket_path)
+        client.sendall(Protocol.encode_request(0, cmd, timer=timer))
+
+        frame = Protocol.FrameReader(client).read_frame()
+    finally:
+        client.close()
+
+    return frame != None and frame[0] == Protocol.ACK
+
+
+def run_client(args):
+    socket_path, seed, duration, timers, mix = args
+    rng = random.Random(seed)
+    commands = list(mix.keys())
+    weights = list(mix.values())
+
+    samples = {cmd: [] for cmd in commands}
+    errors = 0
+
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        cmd = rng.choices(commands, weights)[0]
+        timer = None if cmd in ["STATUS", "LIST"] else f"bench-{rng.randrange(timers)}"
+
+        start = time.perf_counter()
+        try:
+            ok = request(socket_path, cmd, timer=timer)
+        except OSError:
+            ok = False
+        elapsed = time.perf_counter() - start
+
+        if ok:
+            samples[cmd].append(elapsed * 1000)
+        else:
+            errors += 1
+
+    return samples, errors
+
+
+def parse_mix(text) -> dict:
+    mix = {}
+    for item in text.split(","):
+        cmd, weight = item.split("=")
+        mix[cmd.strip().upper()] = float(weight)
+
+    return mix
+
+
+def percentile(samples, fraction):
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-c", "--clients", type=int, default=8, help="Number of concurrent client processes")
+    parser.add_argument("-d", "--duration", type=float, default=10, help="Seconds to run the load for")
+    parser.add_argument("-t", "--timers", type=int, default=8, help="Number of timers in the daemon")
+    parser.add_argument("--mix", default="STATUS=90,LIST=2,START=4,PAUSE=4", help="Weighted command mix")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+
+    with DaemonSandbox(timers=args.timers) as sandbox:
+        cpu_start = sandbox.cpu_seconds()
+        start = time.perf_counter()
+
+        context = multiprocessing.get_context("fork")
+        with context.Pool(args.clients) as pool:
+            results = pool.map(run_client, [(sandbox.socket_path, seed, args.duration, args.timers, mix) for seed in range(args.clients)])
+
+        elapsed = time.perf_counter() - start
+        cpu = sandbox.cpu_seconds() - cpu_start
+        memory = sandbox.memory_kb()
+
+    samples = {cmd: [] for cmd in mix}
+    errors = 0
+    for client_samples, client_errors in results:
+        errors += client_errors
+        for cmd, values in client_samples.items():
+            samples[cmd] += values
+
+    total = sum(len(values) for values in samples.values())
+
+    print(f"{args.clients} clients, {args.timers} timers, {elapsed:.1f}s")
+    print(f"{'command':<10}{'requests':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for cmd, values in samples.items():
+        if len(values) == 0:
+            continue
+
+        values.sort()
+        print(f"{cmd:<10}{len(values):>10}{statistics.median(values):>10.2f}{percentile(values, 0.99):>10.2f}")
+
+    print(f"throughput {total / elapsed:.0f} req/s, {errors} errors")
+    print(f"daemon cpu {cpu:.2f}s ({cpu / elapsed * 100:.0f}% of a core), "
+          f"rss {memory['VmRSS'] / 1024:.1f} MiB, peak {memory['VmHWM'] / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+# Time from launching the daemon to its first STATUS reply.
+#
+# Starts the real daemon in a sandbox (see harness.py) RUNS times. A client
+# polls the socket from the moment the daemon is launched, as the tmux status
+# line would, and the time of the first successful connect and the first
+# STATUS reply are recorded. Connects that fail because the socket does not
+# exist yet are counted; those are status refreshes tmux would have lost.
+#
+# The fake jira_lib can be made to behave like the real one, which pulls in
+# an HTTP stack on import and may talk to Jira when a client is created.
+#
+#   python3 benchmarks/bench_daemon_startup.py [-n RUNS] [-t TIMERS]
+#                                              [--import-delay SECONDS] [--jira-delay SECONDS]
+
+import os
+import sys
+import time
+import socket
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, f"{ROOT}/pytimer_pckg")
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+from pytimer import Protocol
+from harness import DaemonSandbox
+
+
+def first_status(sandbox, start, timeout=30):
+    connected = None
+    failed = 0
+
+    while time.perf_counter() - start < timeout:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.settimeout(timeout)
+
+        try:
+            client.connect(sandbox.socket_path)
+            if connected == None:
+                connected = time.perf_counter() - start
+
+            client.sendall(Protocol.encode_request(0, "STATUS"))
+            frame = Protocol.FrameReader(client).read_frame()
+            if frame != None and frame[0] == Protocol.ACK:
+                return connected, time.perf_counter() - start, failed
+        except (FileNotFoundError, ConnectionRefusedError):
+            failed += 1
+            time.sleep(0.001)
+        finally:
+            client.close()
+
+    raise Exception(f"No STATUS reply within {timeout}s, see {sandbox.runtime_dir}/daemon/daemon.log")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--runs", type=int, default=10, help="Number of daemon starts")
+    parser.add_argument("-t", "--timers", type=int, default=4, help="Number of timers in the daemon")
+    parser.add_argument("--import-delay", type=float, default=0.2, help="Seconds importing jira_lib takes")
+    parser.add_argument("--jira-delay", type=float, default=0.1, help="Seconds creating a Jira client and each call takes")
+    args = parser.parse_args()
+
+    os.environ["JIRA_IMPORT_DELAY"] = str(args.import_delay)
+    os.environ["JIRA_DELAY"] = str(args.jira_delay)
+
+    sandbox = DaemonSandbox(timers=args.timers)
+    sandbox.build()
+
+    connects = []
+    statuses = []
+    failures = 0
+
+    try:
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            launcher = sandbox.start(wait=False)
+
+            connected, status, failed = first_status(sandbox, start)
+            connects.append(connected * 1000)
+            statuses.append(status * 1000)
+            failures += failed
+
+            launcher.wait()
+            sandbox.wait_ready()
+            sandbox.stop()
+    finally:
+        sandbox.stop()
+        sandbox.cleanup()
+
+    print(f"{args.runs} runs, {args.timers} timers, jira_lib import {args.import_delay}s, client {args.jira_delay}s")
+    print(f"{'event':<16}{'p50 ms':>10}{'max ms':>10}")
+    print(f"{'first connect':<16}{statistics.median(connects):>10.1f}{max(connects):>10.1f}")
+    print(f"{'first STATUS':<16}{statistics.median(statuses):>10.1f}{max(statuses):>10.1f}")
+    print(f"failed connects {failures / args.runs:.0f} per start")
+
+
+if __name__ == "__main__":
+    main()
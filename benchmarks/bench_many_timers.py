@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+# Request handling with many timers registered in one daemon.
+#
+# Builds a PyTimerDaemon in process with N Jira timers, half of them running,
+# and times validate_command(), STATUS with a warm and a cold status cache,
+# and START/STOP commands on random timers. The sort and linear scan that
+# used to run on every request are timed alongside for comparison. Nothing
+# is bound or forked, and tmux and Jira are never called.
+#
+#   python3 benchmarks/bench_many_timers.py [-t TIMERS] [-n CALLS]
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+import importlib.util
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, f"{ROOT}/pytimer_pckg")
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+from bench_timer_update import install_fake_jira
+
+
+def load_daemon():
+    spec = importlib.util.spec_from_file_location("pytimer_daemon", f"{ROOT}/scripts/pytimer_daemon.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+
+def build_daemon(module, count):
+    from pytimer import Protocol
+    from pytimer.timers import JiraTimer
+    from pytimer.StatusCache import StatusCache
+    from pytimer.StatusPublisher import StatusPublisher
+    from pytimer.Scheduler import DeadlineScheduler
+    from pytimer.TimerIndex import TimerIndex
+
+    # Skip __init__, it checks the socket and creates the hard coded timers
+    daemon = object.__new__(module.PyTimerDaemon)
+    daemon.timers = TimerIndex()
+    daemon.status_cache = StatusCache()
+    daemon.scheduler = DeadlineScheduler(daemon.fire_deadline)
+    daemon.lock = threading.RLock()
+    daemon.last_status = Protocol.encode_values([""])
+    # Never started, wake() only sets its event
+    daemon.publisher = StatusPublisher(daemon.publish_status, daemon.status_deadlines)
+
+    for i in range(count):
+        timer = JiraTimer(name=f"bench-{i}", priority=random.randint(0, 1000), sessions=4)
+        timer.task = f"BENCH-{i}"
+        daemon.timers.add(timer)
+
+        if i % 2 == 0:
+            timer.start()
+
+    return daemon
+
+
+def bench(name, calls, func):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    elapsed = time.perf_counter() - start
+
+    print(f"{name:<28}{calls / elapsed:>14.0f}{elapsed / calls * 1e6:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-t", "--timers", type=int, default=500, help="Number of timers in the daemon")
+    parser.add_argument("-n", "--calls", type=int, default=2000, help="Number of calls per measurement")
+    args = parser.parse_args()
+
+    install_fake_jira()
+
+    from pytimer import TmuxHelper, Persistence, Effects, Protocol
+
+    plugin_dir = tempfile.mkdtemp()
+    os.makedirs(f"{plugin_dir}/scripts")
+    with open(f"{plugin_dir}/scripts/jira.key", "w") as f:
+        f.write("key")
+
+    os.makedirs("/tmp/tmux-pytimer", exist_ok=True)
+    TmuxHelper.plugin_dir = plugin_dir
+    TmuxHelper.refresh = lambda: None
+    Effects.effects.enqueue = lambda *args, **kwargs: None
+    Effects.effects.spawn = lambda *args, **kwargs: None
+    Persistence.store.path = f"{plugin_dir}/state.json"
+    Persistence.store.start()
+
+    module = load_daemon()
+    daemon = build_daemon(module, args.timers)
+    names = daemon.timers.keys()
+    bodies = [Protocol.encode_request(0, "PAUSE", timer=name)[Protocol.HEADER.size:] for name in names]
+    legacy = {timer.name: timer for timer in daemon.timers.values()}
+
+    def legacy_lookup():
+        name = random.choice(names)
+        timer_names = list(legacy.keys())
+        if name in timer_names:
+            for timer in list(legacy.values()):
+                if timer.name == name:
+                    return timer
+
+    def status_cold():
+        daemon.status_cache.invalidate()
+        daemon.daemon_status()
+
+    def transition():
+        name = random.choice(names)
+        action = "STOP" if str(daemon.timers[name].state) != "Idle" else "START"
+        daemon.handle_command({"type": "timer", "cmd": {"action": action, "timer": name, "blocking": False}})
+
+    print(f"{args.timers} timers")
+    print(f"{'operation':<28}{'calls/s':>14}{'us/call':>12}")
+    bench("sort by priority (old)", args.calls, lambda: sorted(list(legacy.values()), key=lambda timer: timer.priority))
+    bench("lookup by scan (old)", args.calls, legacy_lookup)
+    bench("validate_command", args.calls, lambda: daemon.validate_command(random.choice(bodies), 0))
+    bench("STATUS, cache hit", args.calls, daemon.daemon_status)
+    bench("STATUS, cache miss", args.calls // 10, status_cold)
+    bench("START/STOP", args.calls, transition)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+# Per-refresh latency of the tmux status line command.
+#
+# Compares the full tmux_pytimer.py client with the minimal pytimer_status.py
+# client by spawning each one the way tmux does for #(...). If a daemon is
+# running its socket is used, otherwise a stub daemon answering STATUS is
+# started on the default socket path for the duration of the run.
+#
+#   python3 benchmarks/bench_status_client.py [-n RUNS]
+
+import os
+import sys
+import time
+import socket
+import struct
+import argparse
+import threading
+import subprocess
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+SOCKET_DIR = f"{os.environ.get('PYTIMER_RUNTIME_DIR', '/tmp/tmux-pytimer')}/daemon"
+SOCKET_PATH = f"{SOCKET_DIR}/pytimer.sock"
+STATUS = "#[fg=#282828]#[bg=#427b58]#[bold]  1/3 42m "
+
+# Framing from pytimer.Protocol, repeated so the stub needs no imports
+HEADER = struct.Struct("!IHBB")
+ACK = 3
+
+
+def daemon_alive():
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(SOCKET_PATH)
+    except OSError:
+        return False
+    finally:
+        client.close()
+
+    return True
+
+
+def stub_daemon(server):
+    body = STATUS.encode()
+    payload = HEADER.pack(len(body), 0, ACK, 0) + body
+    while True:
+        try:
+            connection, _ = server.accept()
+        except OSError:
+            return
+
+        # Assumes the whole request arrives in one read
+        with connection:
+            if connection.recv(1024):
+                connection.sendall(payload)
+
+
+def start_stub():
+    os.makedirs(SOCKET_DIR, exist_ok=True)
+    if os.path.exists(SOCKET_PATH):
+        os.unlink(SOCKET_PATH)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(SOCKET_PATH)
+    server.listen(128)
+    threading.Thread(target=stub_daemon, args=(server,), daemon=True).start()
+
+    return server
+
+
+def measure(cmd, env, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - start) * 1000)
+
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--runs", type=int, default=100, help="Number of refreshes per client")
+    args = parser.parse_args()
+
+    server = None
+    if not daemon_alive():
+        server = start_stub()
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([f"{ROOT}/pytimer_pckg", env.get("PYTHONPATH", "")])
+
+    clients = {
+        "tmux_pytimer.py STATUS": [sys.executable, f"{ROOT}/scripts/tmux_pytimer.py", "STATUS"],
+        "pytimer_status.py": [sys.executable, "-S", f"{ROOT}/scripts/pytimer_status.py"],
+    }
+
+    try:
+        print(f"{'client':<28}{'p50 ms':>10}{'p99 ms':>10}")
+        for name, cmd in clients.items():
+            p50, p99 = measure(cmd, env, args.runs)
+            print(f"{name:<28}{p50:>10.2f}{p99:>10.2f}")
+    finally:
+        if server != None:
+            server.close()
+            os.unlink(SOCKET_PATH)
+
+
+if __name__ == "__main__":
+    main()
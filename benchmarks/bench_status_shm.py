@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+# Latency of reading the rendered status over the daemon socket versus the
+# shared status segment.
+#
+# A status segment is published under a temp dir and a stub daemon answering
+# STATUS frames is forked onto a temp socket, so no real daemon is needed and
+# the stub does not share a GIL with the reader. Three reads are timed:
+#
+#   socket         connect, STATUS request, reply, close (a fresh client)
+#   segment        open and map the segment, read, unmap (a fresh client)
+#   segment, held  read from a mapping kept open (a resident reader)
+#
+#   python3 benchmarks/bench_status_shm.py [-n READS]
+
+import os
+import sys
+import time
+import mmap
+import signal
+import socket
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, f"{ROOT}/pytimer_pckg")
+
+from pytimer import Protocol, StatusSegment
+
+STATUS = "#[fg=#282828]#[bg=#427b58]#[bold]  1/3 42m "
+
+
+def serve(server):
+    payload = Protocol.encode_frame(Protocol.ACK, 0, Protocol.encode_values([STATUS]))
+    while True:
+        connection, _ = server.accept()
+        with connection:
+            reader = Protocol.FrameReader(connection)
+            while reader.read_frame() != None:
+                connection.sendall(payload)
+
+
+def start_stub(path):
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(128)
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            serve(server)
+        finally:
+            os._exit(0)
+
+    server.close()
+    return pid
+
+
+def read_socket(path):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+        client.sendall(Protocol.encode_request(0, "STATUS"))
+        frame_type, req_id, flags, body = Protocol.FrameReader(client).read_frame()
+    finally:
+        client.close()
+
+    return Protocol.decode_values(body)[0]
+
+
+def measure(reads, func):
+    samples = []
+    for _ in range(reads):
+        start = time.perf_counter()
+        status = func()
+        samples.append((time.perf_counter() - start) * 1e6)
+
+        if status != STATUS:
+            raise Exception(f"Unexpected status {status!r}")
+
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--reads", type=int, default=10000, help="Number of reads per method")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    socket_path = f"{tmp_dir}/pytimer.sock"
+    segment_path = f"{tmp_dir}/status.shm"
+
+    segment = StatusSegment.StatusSegment(segment_path)
+    segment.open()
+    segment.publish(STATUS)
+
+    pid = start_stub(socket_path)
+
+    try:
+        with open(segment_path, "rb") as f:
+            held = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        methods = {
+            "socket": lambda: read_socket(socket_path),
+            "segment": lambda: StatusSegment.read(segment_path),
+            "segment, held": lambda: StatusSegment.read_segment(held),
+        }
+
+        print(f"{'method':<16}{'p50 us':>10}{'p99 us':>10}")
+        for name, func in methods.items():
+            p50, p99 = measure(args.reads, func)
+            print(f"{name:<16}{p50:>10.2f}{p99:>10.2f}")
+
+        held.close()
+    finally:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+        segment.close()
+        os.unlink(segment_path)
+        os.unlink(socket_path)
+        os.rmdir(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
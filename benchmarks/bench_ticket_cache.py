@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+# Latency of the Set Task menu's ticket lookup against a fake Jira whose
+# searches take DELAY seconds, and a check of how the ticket cache behaves.
+#
+# A fake jira_lib is always registered, so Jira is never contacted. Times
+# TicketCache.get() when the cache is cold (a live search), warm (memory)
+# and stale (memory, refreshed in the background), and checks that:
+#
+#   - stale tickets are replaced by the background refresh
+#   - timers search with the client for their own verify_tls setting
+#   - a timer that goes away is not kept alive by the shared cache
+#
+#   python3 benchmarks/bench_ticket_cache.py [-d DELAY]
+
+import gc
+import os
+import sys
+import time
+import types
+import weakref
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, f"{ROOT}/pytimer_pckg")
+
+# (verify_tls, query) for every search the fake Jira answered
+searches = []
+
+
+def install_fake_jira(delay):
+    class Jira:
+        def __init__(self, key, verify_tls=True):
+            self.verify_tls = verify_tls
+
+        def get_tickets(self, query, fields=None):
+            time.sleep(delay)
+            searches.append((self.verify_tls, query))
+            key = "TLS" if self.verify_tls else "NOTLS"
+
+            return [{"key": f"{key}-{i}", "expand": "", "fields": {"summary": f"Ticket {i}"}} for i in range(20)]
+
+    jira_lib = types.ModuleType("jira_lib")
+    jira_lib.Jira = Jira
+    jira_lib.JiraFields = types.SimpleNamespace(SUMMARY="summary", ASSIGNEE="assignee",
+                                                STATUS="status", PROJECT="project", SPRINT="sprint")
+    sys.modules["jira_lib"] = jira_lib
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+
+    return result, (time.perf_counter() - start) * 1000
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+
+        time.sleep(0.001)
+
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--delay", type=float, default=0.2, help="Seconds every fake Jira search takes")
+    args = parser.parse_args()
+
+    install_fake_jira(args.delay)
+
+    from pytimer import TmuxHelper, Persistence
+    from pytimer.timers import JiraTimer
+
+    plugin_dir = tempfile.mkdtemp()
+    os.makedirs(f"{plugin_dir}/scripts")
+    with open(f"{plugin_dir}/scripts/jira.key", "w") as f:
+        f.write("key")
+
+    TmuxHelper.plugin_dir = plugin_dir
+    # Never started, the timers' snapshots are only collected
+    Persistence.store.path = f"{plugin_dir}/state.json"
+
+    secure = JiraTimer(name="secure", verify_tls=True)
+    insecure = JiraTimer(name="insecure", verify_tls=False)
+
+    print(f"{'lookup':<12}{'ms':>10}")
+
+    tickets, cold = timed(secure.tickets.get)
+    print(f"{'cold':<12}{cold:>10.2f}")
+
+    tickets, warm = timed(secure.tickets.get)
+    print(f"{'warm':<12}{warm:>10.3f}")
+
+    secure.tickets.invalidate()
+    count = len(searches)
+    tickets, stale = timed(secure.tickets.get)
+    print(f"{'stale':<12}{stale:>10.3f}")
+
+    if cold < args.delay * 1000 or warm > args.delay * 100 or stale > args.delay * 100:
+        raise Exception("Only a cold cache should wait for Jira")
+
+    if not wait_for(lambda: len(searches) > count and not secure.tickets.refreshing):
+        raise Exception("Stale tickets were not refreshed in the background")
+
+    insecure.tickets.get()
+    if [verify_tls for verify_tls, query in searches] != [True, True, False]:
+        raise Exception(f"Searches used the wrong clients: {searches}")
+
+    if not secure.tickets.get()[0]["key"].startswith("TLS-") or not insecure.tickets.get()[0]["key"].startswith("NOTLS-"):
+        raise Exception("A timer was served another client's tickets")
+
+    # The cache outlives the timer that created it
+    removed = weakref.ref(insecure)
+    del insecure
+    gc.collect()
+    if removed() != None:
+        raise Exception("The ticket cache keeps a removed timer alive")
+
+    print(f"{len(searches)} searches, all checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+# Throughput of JiraTimer.update(), the per-timer work behind every STATUS,
+# and of pause/resume transitions.
+#
+# The timer is built against a throwaway plugin dir with a dummy jira.key. If
+# jira_lib is not installed a do-nothing stand-in is registered, update()
+# never talks to Jira.
+#
+#   python3 benchmarks/bench_timer_update.py [-n CALLS]
+
+import os
+import sys
+import time
+import types
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, f"{ROOT}/pytimer_pckg")
+
+
+def install_fake_jira():
+    try:
+        import jira_lib
+    except ImportError:
+        jira_lib = types.ModuleType("jira_lib")
+        jira_lib.Jira = lambda key, verify_tls=True: None
+        jira_lib.JiraFields = types.SimpleNamespace(SUMMARY="summary", ASSIGNEE="assignee",
+                                                    STATUS="status", PROJECT="project", SPRINT="sprint")
+        sys.modules["jira_lib"] = jira_lib
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--calls", type=int, default=100000, help="Number of update() calls per state")
+    args = parser.parse_args()
+
+    install_fake_jira()
+
+    from pytimer import TmuxHelper, Persistence
+    from pytimer.timers import JiraTimer
+
+    plugin_dir = tempfile.mkdtemp()
+    os.makedirs(f"{plugin_dir}/scripts")
+    with open(f"{plugin_dir}/scripts/jira.key", "w") as f:
+        f.write("key")
+
+    os.makedirs("/tmp/tmux-pytimer", exist_ok=True)
+    TmuxHelper.plugin_dir = plugin_dir
+    # Transitions refresh tmux and write the state file, which is not what
+    # is being measured
+    TmuxHelper.refresh = lambda: None
+    Persistence.store.path = f"{plugin_dir}/state.json"
+    Persistence.store.start()
+
+    timer = JiraTimer(name="bench-update")
+    timer.task = "BENCH-1"
+
+    print(f"{'state':<12}{'calls/s':>14}{'us/call':>10}")
+    for state in ["Idle", "Working", "Paused"]:
+        if state == "Working":
+            timer.start()
+        elif state == "Paused":
+            timer.pause()
+
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            timer.update()
+        elapsed = time.perf_counter() - start
+
+        print(f"{state:<12}{args.calls / elapsed:>14.0f}{elapsed / args.calls * 1e6:>10.2f}")
+
+    # Every transition used to build a fresh state object
+    calls = args.calls // 10
+    start = time.perf_counter()
+    for _ in range(calls):
+        timer.resume()
+        timer.pause()
+    elapsed = time.perf_counter() - start
+
+    print(f"{'Resume+Pause':<12}{calls / elapsed:>14.0f}{elapsed / calls * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
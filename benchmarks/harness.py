@@ -0,0 +1,203 @@
+# Runs the real daemon in a sandbox for the end to end benchmarks.
+#
+# The plugin is copied into a temp .tmux/plugins/tmux-pytimer layout (the
+# daemon derives its plugin dir from its own path) with a dummy jira.key and
+# a timers.toml with the requested number of timers. A fake jira_lib is put
+# first on PYTHONPATH and a stub tmux script first on PATH, so the daemon
+# never talks to Jira or a tmux server. Set JIRA_DELAY in the environment to
+# make creating a fake Jira client and every call on it sleep that many
+# seconds, and JIRA_IMPORT_DELAY to make importing jira_lib sleep.
+#
+# PYTIMER_RUNTIME_DIR points the daemon's socket, log, state file, Jira
+# journals and status segment at the sandbox's own runtime dir, so a daemon
+# the user is running and their data in /tmp/tmux-pytimer are never touched,
+# even when a run is killed.
+
+import os
+import sys
+import time
+import shutil
+import signal
+import socket
+import struct
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+FAKE_JIRA = '''import os
+import time
+
+time.sleep(float(os.environ.get("JIRA_IMPORT_DELAY", "0")))
+
+class JiraFields:
+    SUMMARY = "summary"
+    ASSIGNEE = "assignee"
+    STATUS = "status"
+    PROJECT = "project"
+    SPRINT = "sprint"
+
+class Jira:
+    def __init__(self, key, verify_tls=True):
+        self.delay = float(os.environ.get("JIRA_DELAY", "0"))
+        self.wait()
+
+    def wait(self):
+        if self.delay > 0:
+            time.sleep(self.delay)
+
+    def get_tickets(self, query, fields=None):
+        self.wait()
+        return [{"key": f"BENCH-{i}", "expand": "", "fields": {"summary": f"Benchmark ticket {i}"}} for i in range(20)]
+
+    def add_comment(self, key, comment):
+        self.wait()
+
+    def add_worklog(self, key, started=None, time_spent_seconds=0):
+        self.wait()
+'''
+
+# Control mode is refused so the daemon falls back to one process per tmux
+# command, the same as running without a tmux server that supports -C
+STUB_TMUX = '''#!/bin/sh
+case "$1" in
+    -C) exit 1 ;;
+    list-clients) echo "0 1 40 120 /dev/pts/0" ;;
+esac
+exit 0
+'''
+
+
+def daemon_alive(socket_path):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError:
+        return False
+    finally:
+        client.close()
+
+    return True
+
+
+class DaemonSandbox:
+    def __init__(self, timers=4):
+        self.timers = timers
+        self.dir = None
+        self.pid = None
+        self.runtime_dir = None
+        self.socket_path = None
+        self.segment_path = None
+
+    def __enter__(self):
+        self.build()
+        self.start()
+        self.wait_ready()
+
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        self.cleanup()
+
+    def build(self):
+        self.dir = tempfile.mkdtemp(prefix="pytimer-bench-")
+        self.plugin_dir = f"{self.dir}/.tmux/plugins/tmux-pytimer"
+        self.runtime_dir = f"{self.dir}/runtime"
+        self.socket_path = f"{self.runtime_dir}/daemon/pytimer.sock"
+        self.segment_path = f"{self.runtime_dir}/status.shm"
+
+        shutil.copytree(f"{ROOT}/scripts", f"{self.plugin_dir}/scripts")
+        shutil.copytree(f"{ROOT}/pytimer_pckg/pytimer", f"{self.plugin_dir}/pytimer_pckg/pytimer",
+                        ignore=shutil.ignore_patterns("__pycache__"))
+
+        with open(f"{self.plugin_dir}/scripts/jira.key", "w") as f:
+            f.write("key")
+
+        with open(f"{self.plugin_dir}/timers.toml", "w") as f:
+            for i in range(self.timers):
+                f.write(f"[timers.bench-{i}]\npriority = {i}\nsessions = 4\n\n")
+
+        os.makedirs(f"{self.dir}/lib")
+        with open(f"{self.dir}/lib/jira_lib.py", "w") as f:
+            f.write(FAKE_JIRA)
+
+        os.makedirs(f"{self.dir}/bin")
+        with open(f"{self.dir}/bin/tmux", "w") as f:
+            f.write(STUB_TMUX)
+        os.chmod(f"{self.dir}/bin/tmux", 0o755)
+
+        self.env = dict(os.environ)
+        self.env["PATH"] = os.pathsep.join([f"{self.dir}/bin", self.env.get("PATH", "")])
+        self.env["PYTHONPATH"] = os.pathsep.join([f"{self.dir}/lib", f"{self.plugin_dir}/pytimer_pckg"])
+        self.env["PYTIMER_RUNTIME_DIR"] = self.runtime_dir
+
+    def start(self, wait=True):
+        # The launching process exits once the daemon has forked
+        launcher = subprocess.Popen([sys.executable, f"{self.plugin_dir}/scripts/pytimer_daemon.py"], env=self.env)
+        if wait and launcher.wait() != 0:
+            raise Exception(f"The daemon exited with {launcher.returncode}")
+
+        return launcher
+
+    def wait_ready(self, timeout=10):
+        deadline = time.monotonic() + timeout
+        while not daemon_alive(self.socket_path):
+            if time.monotonic() > deadline:
+                raise Exception(f"The daemon did not start within {timeout}s, see {self.runtime_dir}/daemon/daemon.log")
+
+            time.sleep(0.001)
+
+        # The forked daemon publishes its pid in the status segment
+        while self.pid == None:
+            try:
+                with open(self.segment_path, "rb") as f:
+                    magic, sequence, pid, length = struct.unpack("=4sIII", f.read(16))
+                if magic == b"PYTS" and pid != 0 and os.path.exists(f"/proc/{pid}"):
+                    self.pid = pid
+            except (OSError, struct.error):
+                pass
+
+            if time.monotonic() > deadline:
+                raise Exception("The daemon did not publish its pid")
+
+            time.sleep(0.001)
+
+    def stop(self):
+        if self.pid == None:
+            return
+
+        os.kill(self.pid, signal.SIGTERM)
+        while os.path.exists(f"/proc/{self.pid}") and self.read_proc_state() not in ["Z", None]:
+            time.sleep(0.01)
+
+        self.pid = None
+
+    def cleanup(self):
+        if self.dir != None:
+            shutil.rmtree(self.dir)
+            self.dir = None
+
+    def read_proc_state(self):
+        try:
+            with open(f"/proc/{self.pid}/stat", "r") as f:
+                return f.read().rsplit(")", 1)[1].split()[0]
+        except OSError:
+            return None
+
+    def cpu_seconds(self) -> float:
+        # utime + stime of the daemon process, including all its threads
+        with open(f"/proc/{self.pid}/stat", "r") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+    def memory_kb(self) -> dict:
+        memory = {}
+        with open(f"/proc/{self.pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:") or line.startswith("VmHWM:"):
+                    name, value = line.split(":")
+                    memory[name] = int(value.split()[0])
+
+        return memory
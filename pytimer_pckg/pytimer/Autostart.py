@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import fcntl
+import socket
+import subprocess
+from . import TmuxHelper, Runtime
+
+SOCKET_PATH = Runtime.SOCKET_PATH
+LOCK_PATH = f"{Runtime.DAEMON_DIR}/autostart.lock"
+# Seconds to wait after a failed start before trying again
+BACKOFF = 60
+
+def daemon_alive(socket_path=SOCKET_PATH) -> bool:
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        client.connect(socket_path)
+    except OSError:
+        return False
+    finally:
+        client.close()
+
+    return True
+
+
+# Starts the daemon for a client that found nothing listening. Clients that
+# get here at the same time queue on the lock file, and all but the first
+# find the daemon listening once they hold it, so only one is launched. The
+# daemon's own check_sock_alive() still guards against anything else racing.
+#
+# The lock file also holds the time of the last failed start. A broken
+# install is only retried every BACKOFF seconds instead of launching a
+# daemon on every status refresh.
+def start_daemon(timeout=10) -> bool:
+    os.makedirs(os.path.dirname(LOCK_PATH), exist_ok=True)
+
+    with open(LOCK_PATH, "a+") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        if daemon_alive():
+            return True
+
+        lock.seek(0)
+        try:
+            failed = float(lock.read())
+        except ValueError:
+            failed = 0
+
+        if time.time() - failed < BACKOFF:
+            return False
+
+        # The launcher exits once the daemon has bound its socket and forked.
+        # Nothing is inherited, so tmux does not wait on the daemon's output
+        # and the daemon outlives the client that started it.
+        try:
+            launcher = subprocess.run([sys.executable, f"{TmuxHelper.get_plugin_dir()}/scripts/pytimer_daemon.py"],
+                                      stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                      start_new_session=True, timeout=timeout)
+            started = launcher.returncode == 0 and daemon_alive()
+        except subprocess.TimeoutExpired:
+            started = False
+
+        lock.truncate(0)
+        if not started:
+            lock.write(str(time.time()))
+
+    return started
@@ -0,0 +1,124 @@
+import socket
+import logging
+import threading
+from concurrent.futures import Future
+from pytimer import Protocol, Runtime
+
+SOCKET_PATH = Runtime.SOCKET_PATH
+
+# A long lived connection to the daemon for resident helpers. Every request
+# is tagged with its own request id and answered with a Future, so many
+# requests can be in flight on one connection and the daemon may answer them
+# in any order. A reader thread matches the frames back to their futures.
+# Requests that depend on each other (START then PAUSE) must wait for the
+# first reply before sending the second.
+class DaemonClient:
+    MAX_ID = 0xFFFF
+
+    def __init__(self, path=SOCKET_PATH, timeout=300):
+        self.path = path
+        self.timeout = timeout
+        self.socket = None
+        self.pending = {}
+        self.next_id = 0
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def connect(self):
+        if self.socket != None:
+            return
+
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(self.path)
+
+        self.thread = threading.Thread(target=self.read, args=(self.socket,), name="pytimer-client", daemon=True)
+        self.thread.start()
+
+    def close(self):
+        with self.lock:
+            sock = self.socket
+            self.socket = None
+
+        if sock != None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+            sock.close()
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_id(self) -> int:
+        # Id 0 is left to the one shot clients. Ids wrap around, skipping any
+        # that are still waiting for a reply.
+        for _ in range(self.MAX_ID):
+            self.next_id = self.next_id % self.MAX_ID + 1
+            if self.next_id not in self.pending:
+                return self.next_id
+
+        raise Exception(f"More than {self.MAX_ID} requests in flight")
+
+    def submit(self, cmd, timer=None, value=None) -> Future:
+        future = Future()
+
+        with self.lock:
+            if self.socket == None:
+                raise ConnectionError("Not connected to the daemon")
+
+            req_id = self.get_id()
+            self.pending[req_id] = future
+            # Sent under the lock so frames from different threads never interleave
+            self.socket.sendall(Protocol.encode_request(req_id, cmd, timer=timer, value=value))
+
+        return future
+
+    def request(self, cmd, timer=None, value=None) -> list:
+        return self.submit(cmd, timer=timer, value=value).result(timeout=self.timeout)
+
+    def status(self) -> str:
+        values = self.request("STATUS")
+        return values[0] if len(values) > 0 else ""
+
+    def read(self, sock):
+        reader = Protocol.FrameReader(sock)
+
+        try:
+            while True:
+                frame = reader.read_frame()
+                if frame == None:
+                    break
+
+                frame_type, req_id, flags, body = frame
+
+                # SYN_ACK only matters to the blocking one shot clients
+                if frame_type == Protocol.SYN_ACK:
+                    continue
+
+                with self.lock:
+                    future = self.pending.pop(req_id, None)
+
+                if future == None:
+                    logging.warning(f"Received a reply for unknown request {req_id}")
+                elif frame_type == Protocol.ACK:
+                    future.set_result(Protocol.decode_values(body))
+                elif frame_type == Protocol.ERROR:
+                    future.set_exception(Exception(f"Daemon error: {body.decode()}"))
+                else:
+                    future.set_exception(Exception(f"Unexpected frame type {frame_type}"))
+        except OSError:
+            pass
+
+        with self.lock:
+            pending = self.pending
+            self.pending = {}
+            if self.socket is sock:
+                self.socket = None
+
+        for future in pending.values():
+            future.set_exception(ConnectionError("Daemon closed the connection"))
@@ -0,0 +1,53 @@
+import os
+import json
+import logging
+from . import JiraClient, Runtime
+from .Journal import JournalQueue
+
+# Jira comments are journaled before they are sent, so a comment made while
+# Jira is unreachable (or the daemon is restarting) is replayed later.
+class CommentQueue(JournalQueue):
+    LEGACY_PATH = f"{Runtime.RUNTIME_DIR}/jira-comments.json"
+
+    def start(self):
+        super().start()
+        self.import_legacy()
+
+    def import_legacy(self):
+        # Comments saved by the old add_comment.py fallback
+        if not os.path.exists(self.LEGACY_PATH):
+            return
+
+        try:
+            with open(self.LEGACY_PATH, "r") as f:
+                comments = json.load(f)
+        except Exception as e:
+            logging.warning(f"[{e.__class__.__name__}] Unable to read {self.LEGACY_PATH}")
+            return
+
+        # A crash between importing and unlinking the file imports it again
+        # on the next start, so skip comments that were already imported.
+        # Comments made in the daemon are never matched, two identical
+        # comments made while offline are both sent.
+        imported = set()
+        for entry in self.journal.pending():
+            if entry.get("legacy"):
+                imported.add((entry["timestamp"], entry["key"], entry["comment"]))
+
+        added = 0
+        for comment in comments:
+            if (comment["timestamp"], comment["key"], comment["comment"]) in imported:
+                continue
+
+            self.add({"timestamp": comment["timestamp"], "key": comment["key"], "comment": comment["comment"], "verify_tls": False, "legacy": True})
+            added += 1
+
+        os.unlink(self.LEGACY_PATH)
+        logging.info(f"Imported {added} comments from {self.LEGACY_PATH}")
+
+    def send(self, group):
+        for entry in group:
+            JiraClient.get_client(verify_tls=entry["verify_tls"]).add_comment(entry["key"], entry["comment"])
+
+
+comments = CommentQueue(f"{Runtime.RUNTIME_DIR}/jira-comments.jsonl")
@@ -0,0 +1,94 @@
+import re
+import inspect
+try:
+    import tomllib
+except ImportError:
+    # Python < 3.11
+    import tomli as tomllib
+from .timers import JiraTimer
+
+# Timers are declared in a TOML file, one table per timer under [timers]
+# named after the timer. Every key other than type is passed to the timer's
+# constructor:
+#
+#   [timers.Jira]
+#   type = "jira"
+#   verify_tls = false
+#
+# A spec is the table as a dict with the name filled in. Two equal specs
+# describe the same timer, which is what lets a reload keep timers that did
+# not change.
+TIMER_TYPES = {
+    "jira": JiraTimer
+}
+
+# Used when there is no config file
+DEFAULT_SPECS = {
+    "Jira": {"type": "jira", "name": "Jira", "verify_tls": False},
+    "Test": {"type": "jira", "name": "Test", "priority": 100, "sessions": 1, "verify_tls": False}
+}
+
+# Names end up unquoted in the run-shell commands of the timer menus
+NAME_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+
+# Minutes and counts, zero would have a phase roll over as soon as it starts
+# or refuse every restored iteration
+POSITIVE_OPTIONS = ["time_work", "time_break_short", "time_break_long", "sessions", "iteration"]
+
+def verify_spec(spec: dict) -> dict:
+    if type(spec.get("name")) != str or len(spec["name"]) == 0:
+        raise Exception(f"Timer is missing a name: {spec}")
+
+    if NAME_PATTERN.fullmatch(spec["name"]) == None:
+        raise Exception(f"{spec['name']!r} is not a valid timer name, only letters, digits, _ and - are allowed")
+
+    timer_type = spec.get("type", "jira")
+    if timer_type not in TIMER_TYPES:
+        raise Exception(f"{spec['name']}: {timer_type} is not a valid timer type. Valid types are: {list(TIMER_TYPES.keys())}")
+
+    params = inspect.signature(TIMER_TYPES[timer_type]).parameters
+    for key, value in spec.items():
+        if key == "type":
+            continue
+
+        if key not in params:
+            raise Exception(f"{spec['name']}: {key} is not a valid option for a {timer_type} timer")
+
+        # Values must have the type of the constructor's default, so a bad
+        # value is refused here rather than breaking the timer later
+        default = params[key].default
+        if default != inspect.Parameter.empty and default != None and type(value) != type(default):
+            raise Exception(f"{spec['name']}: {key} must be of type {type(default).__name__}, got {value!r}")
+
+        if key in POSITIVE_OPTIONS and value <= 0:
+            raise Exception(f"{spec['name']}: {key} must be greater than 0, got {value!r}")
+
+    return dict(spec, type=timer_type)
+
+
+def load(path) -> dict:
+    with open(path, "rb") as f:
+        config = tomllib.load(f)
+
+    timers = config.get("timers", {})
+    if type(timers) != dict:
+        raise Exception(f"[timers] in {path} must be a table")
+
+    specs = {}
+    for name, spec in timers.items():
+        specs[name] = verify_spec(dict(spec, name=name))
+
+    return specs
+
+
+def parse_spec(text) -> dict:
+    # A single timer as a TOML inline table, e.g. the value of an ADD command:
+    # { name = "Pairing", priority = 10 }
+    return verify_spec(tomllib.loads(f"timer = {text}")["timer"])
+
+
+def create_timer(spec: dict):
+    kwargs = dict(spec)
+    timer_type = kwargs.pop("type")
+
+    return TIMER_TYPES[timer_type](**kwargs)
@@ -1,12 +1,13 @@
 import logging
 import socket
-from pytimer import TmuxHelper
+from pytimer import TmuxHelper, Protocol
 
 class DaemonState:
     AWAIT_MSG = None
 
     def __init__(self):
         self.socket = socket.socket()
+        self.reader = None
         self.done = False
         self.value = None
         self.fault = False
@@ -23,64 +24,40 @@ class DaemonState:
     def handle_msgs(self):
         raise NotImplementedError
 
-    def get_msgs(self):
-        while True:
-            response = self.socket.recv(1024)
-            response = response.decode()
-            response = response.split(";")
-
-            # continue if no data sent
-            if len(response) == 1:
-                continue
+    def get_msg(self):
+        frame = self.reader.read_frame()
+        if frame == None:
+            TmuxHelper.message_create(f"{self} expected {self.AWAIT_MSG}, but the daemon closed the connection")
+            self.fault = True
+            return None
 
-            response = response[:-1]
+        frame_type, req_id, flags, body = frame
+        if frame_type == Protocol.ERROR:
+            TmuxHelper.message_create(f"Daemon error: {body.decode()}")
+            self.fault = True
+            return None
 
-            if self.queue == None:
-                self.queue = response
-            else:
-                self.queue = self.queue + response
+        if frame_type != self.AWAIT_MSG:
+            TmuxHelper.message_create(f"{self} expected {self.AWAIT_MSG}, but recieved {frame_type}")
+            self.fault = True
+            return None
 
-            if self.AWAIT_MSG in response:
-                break
+        return body
 
 
 class SynAck(DaemonState):
-    AWAIT_MSG = "SYN ACK"
+    AWAIT_MSG = Protocol.SYN_ACK
 
-    def __init__(self, socket: socket.socket, queue=[]):
+    def __init__(self, socket: socket.socket, reader=None):
         self.socket = socket
+        self.reader = reader or Protocol.FrameReader(socket)
         self.done = False
         self.value = None
-        self.queue = queue
         self.fault = False
 
 
     def handle_msgs(self):
-        if len(self.queue) == 0:
-            self.get_msgs()
-
-        response = self.queue
-        self.queue = []
-
-        if self.AWAIT_MSG not in response:
-            TmuxHelper.message_create(f"{self} expected {self.AWAIT_MSG}")
-            self.fault = True
-            self.next()
-
-        response = response[response.index(self.AWAIT_MSG):]
-
-        while True:
-            msg = response.pop(0)
-            if msg != self.AWAIT_MSG:
-                TmuxHelper.message_create(f"{self} expected {self.AWAIT_MSG}, but recieved {msg}")
-                self.fault = True
-
-                break
-            else:
-                if len(response) > 0:
-                    self.queue = response
-
-                break
+        self.get_msg()
 
 
     def next(self):
@@ -89,42 +66,23 @@ class SynAck(DaemonState):
         if self.fault:
             return Done(self.socket)
 
-        return Ack(self.socket, queue=self.queue)
+        return Ack(self.socket, reader=self.reader)
 
 
 class Ack(DaemonState):
-    AWAIT_MSG = "ACK"
+    AWAIT_MSG = Protocol.ACK
 
-    def __init__(self, socket: socket.socket, queue=[]):
+    def __init__(self, socket: socket.socket, reader=None):
         self.socket = socket
+        self.reader = reader or Protocol.FrameReader(socket)
         self.done = False
         self.value = []
-        self.queue = queue
         self.fault = False
 
     def handle_msgs(self):
-        if len(self.queue) == 0:
-            self.get_msgs()
-        elif self.AWAIT_MSG not in self.queue:
-            self.get_msgs()
-
-        response = self.queue
-        self.queue = []
-
-        if self.AWAIT_MSG not in response:
-            TmuxHelper.message_create(f"{self} expected {self.AWAIT_MSG}")
-            self.fault = True
-            self.next()
-
-        while True:
-            msg = response.pop(0)
-            if msg != self.AWAIT_MSG:
-                self.value.append(msg)
-            else:
-                if len(response) > 0:
-                    self.queue = response
-
-                break
+        body = self.get_msg()
+        if body != None:
+            self.value = Protocol.decode_values(body)
 
 
     def next(self):
@@ -132,19 +90,6 @@ class Ack(DaemonState):
         for val in self.value:
             print(val)
 
-        if len(self.queue) == 0:
-            return Done(self.socket, value=self.value)
-
-        if len(self.queue) > 0:
-            if self.queue[0] == SynAck.AWAIT_MSG:
-                return SynAck(self.socket, queue=self.queue)
-            elif Ack.AWAIT_MSG in self.queue:
-                return Ack(self.socket, queue=self.queue)
-            else:
-                TmuxHelper.message_create("Unexpected data received after ACK")
-        else:
-            TmuxHelper.message_create("Msgs provided to ACK, but no messages present")
-
         return Done(self.socket, value=self.value)
 
 
@@ -152,7 +97,6 @@ class Done(DaemonState):
     def __init__(self, socket: socket.socket, value=[]):
         self.socket = socket
         self.value = value
-        self.queue = []
         self.fault = False
 
         self.socket.close()
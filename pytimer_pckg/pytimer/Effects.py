@@ -0,0 +1,54 @@
+import queue
+import logging
+import threading
+
+# Popups, menus and messages raised by the daemon wait on the user, so they
+# are run off the request that caused them. Effects run inline until start()
+# is called.
+#
+# Only notifications whose order matters go through enqueue(), one at a time
+# on a worker thread ("Session finished" before its comment popup). Menus
+# are shown at once on their own thread with spawn(), so they never wait for
+# a popup the user has not dismissed. enqueue_detached() keeps an effect in
+# order but runs it on its own thread once its turn comes, for popups that
+# wait on input and must not hold up the notifications after them.
+class EffectQueue:
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def start(self):
+        if self.thread != None:
+            return
+
+        self.thread = threading.Thread(target=self.run, name="pytimer-effects", daemon=True)
+        self.thread.start()
+
+    def enqueue(self, func, *args, **kwargs):
+        if self.thread == None:
+            func(*args, **kwargs)
+        else:
+            self.queue.put((func, args, kwargs))
+
+    def enqueue_detached(self, func, *args, **kwargs):
+        self.enqueue(self.spawn, func, *args, **kwargs)
+
+    def spawn(self, func, *args, **kwargs):
+        if self.thread == None:
+            func(*args, **kwargs)
+        else:
+            threading.Thread(target=self.call, args=(func, args, kwargs), name=f"pytimer-effect-{func.__name__}", daemon=True).start()
+
+    def call(self, func, args, kwargs):
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            logging.error(f"[{e.__class__.__name__}] UI effect {func.__name__} failed: {e}")
+
+    def run(self):
+        while True:
+            func, args, kwargs = self.queue.get()
+            self.call(func, args, kwargs)
+
+
+effects = EffectQueue()
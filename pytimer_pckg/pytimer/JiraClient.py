@@ -0,0 +1,56 @@
+import time
+import logging
+import threading
+from . import TmuxHelper
+from .Metrics import metrics
+
+# Times every call made through the wrapped client and counts failures
+class InstrumentedJira:
+    def __init__(self, jira):
+        self.jira = jira
+
+    def __getattr__(self, name):
+        # A jira_lib without the method fails for good, the journal queues
+        # dead-letter the entries instead of retrying them
+        attr = getattr(self.jira, name, None)
+        if attr == None:
+            raise AttributeError(f"{self.jira.__class__.__module__}.{self.jira.__class__.__name__} has no {name}()")
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            except Exception:
+                metrics.inc("pytimer_jira_errors_total", method=name)
+                raise
+            finally:
+                metrics.observe("pytimer_jira_seconds", time.perf_counter() - start, method=name)
+
+        return call
+
+
+# One Jira client per TLS setting, shared by every timer in the daemon so
+# requests reuse the client's connections instead of each timer (or a
+# separate comment process) opening its own.
+#
+# jira_lib pulls in an HTTP stack and creating a client may talk to Jira, so
+# both wait for the first call that needs a client. The daemon serves STATUS
+# without ever making one.
+clients = {}
+lock = threading.Lock()
+
+def get_client(verify_tls=True) -> InstrumentedJira:
+    with lock:
+        if verify_tls not in clients:
+            start = time.perf_counter()
+            from jira_lib import Jira
+
+            with open(f"{TmuxHelper.get_plugin_dir()}/scripts/jira.key", "r") as f:
+                clients[verify_tls] = InstrumentedJira(Jira(f.read().rstrip(), verify_tls=verify_tls))
+
+            logging.info(f"Created Jira client (verify_tls={verify_tls}) in {time.perf_counter() - start:.3f}s")
+
+        return clients[verify_tls]
+
@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+
+# Append-only JSON Lines journal. Each entry is a line with an "id" and
+# finishing entries appends {"done": id}, so nothing is ever rewritten in
+# place and a crash loses at most a partial last line, which load() cuts off
+# before appending again. Lines are flushed on append and fsync'd in batches
+# by sync(). compact() rewrites the file with only the pending entries using
+# a temp file and os.replace().
+class Journal:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.done_count = 0
+        self.dirty = False
+        self.lock = threading.RLock()
+        self.file = None
+
+    def load(self):
+        with self.lock:
+            self.entries = {}
+            self.done_count = 0
+
+            if os.path.exists(self.path):
+                with open(self.path, "rb") as f:
+                    data = f.read()
+
+                for line in data.splitlines():
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logging.warning(f"Skipping corrupt line in {self.path}")
+                        continue
+
+                    if type(record) != dict:
+                        logging.warning(f"Skipping corrupt line in {self.path}")
+                    elif "done" in record:
+                        self.entries.pop(record["done"], None)
+                        self.done_count += 1
+                    elif "id" in record:
+                        self.entries[record["id"]] = record
+                    else:
+                        logging.warning(f"Skipping line without an id in {self.path}")
+
+                self.repair(data)
+
+            self.file = open(self.path, "a")
+
+        return self.pending()
+
+    def repair(self, data):
+        # A crash mid-append leaves a last line without its newline. Appending
+        # after it would join the next record onto it, so the tail is either
+        # finished (it was written completely) or cut off.
+        end = data.rfind(b"\n") + 1
+        if end == len(data):
+            return
+
+        try:
+            json.loads(data[end:])
+            complete = True
+        except ValueError:
+            complete = False
+
+        if complete:
+            with open(self.path, "ab") as f:
+                f.write(b"\n")
+        else:
+            logging.warning(f"Truncating partial last line in {self.path}")
+            os.truncate(self.path, end)
+
+    def pending(self) -> list:
+        with self.lock:
+            return list(self.entries.values())
+
+    def write(self, record):
+        if self.file == None:
+            self.load()
+
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        self.dirty = True
+
+    def append(self, entry: dict) -> str:
+        with self.lock:
+            entry = dict(entry, id=uuid.uuid4().hex)
+            self.write(entry)
+            self.entries[entry["id"]] = entry
+
+        return entry["id"]
+
+    def done(self, ids):
+        with self.lock:
+            for id in ids:
+                if self.entries.pop(id, None) != None:
+                    self.write({"done": id})
+                    self.done_count += 1
+
+    def sync(self):
+        with self.lock:
+            if self.dirty and self.file != None:
+                os.fsync(self.file.fileno())
+                self.dirty = False
+
+    def compact(self):
+        with self.lock:
+            if self.file == None:
+                return
+
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry) + "\n")
+
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.file.close()
+            os.replace(tmp_path, self.path)
+            self.file = open(self.path, "a")
+            self.done_count = 0
+            self.dirty = False
+
+
+# Background replay of a Journal. Entries are drained in rounds of up to
+# BATCH_SIZE and every group is tried on its own, so one failing group does
+# not hold back the others. Failures are classified by classify():
+#
+#   unreachable  Jira never answered. Nothing can be sent, so the round ends
+#                and the worker backs off exponentially. Not counted, the
+#                queues exist to hold entries while offline.
+#   transient    Jira answered with an error. The group is retried after the
+#                back off, up to MAX_ATTEMPTS times.
+#   permanent    Retrying cannot help (a deleted issue, 400, 403), or the
+#                Jira client has no such method or signature.
+#
+# Entries that fail permanently or too many times are moved to the
+# dead-letter file next to the journal and logged. Everything else stays in
+# the journal, so it is retried later or after a restart. With
+# FLUSH_INTERVAL set, entries are buffered and drained on that interval
+# instead of as soon as they are added. Subclasses implement send() and may
+# group entries with groups().
+class JournalQueue:
+    BATCH_SIZE = 20
+    BACKOFF_MIN = 5
+    BACKOFF_MAX = 600
+    MAX_ATTEMPTS = 5
+    PERMANENT_STATUS = [400, 403, 404, 410]
+    PERMANENT_ERRORS = (AttributeError, TypeError)
+    SYNC_DELAY = 1
+    COMPACT_AFTER = 100
+    FLUSH_INTERVAL = None
+
+    def __init__(self, path):
+        self.journal = Journal(path)
+        self.failed_path = f"{os.path.splitext(path)[0]}.failed.jsonl"
+        self.event = threading.Event()
+        self.backoff = 0
+        # Failed sends per entry id, since the daemon started
+        self.attempts = {}
+        self.thread = None
+
+    def start(self):
+        if self.thread != None:
+            return
+
+        pending = self.journal.load()
+        if len(pending) > 0:
+            logging.info(f"Replaying {len(pending)} entries from {self.journal.path}")
+            self.event.set()
+
+        self.thread = threading.Thread(target=self.run, name=f"pytimer-{self.__class__.__name__}", daemon=True)
+        self.thread.start()
+
+    def add(self, entry: dict):
+        self.journal.append(entry)
+        self.event.set()
+
+    def groups(self, pending) -> list:
+        return [[entry] for entry in pending]
+
+    def send(self, group):
+        raise NotImplementedError
+
+    def classify(self, e) -> str:
+        if isinstance(e, self.PERMANENT_ERRORS):
+            return "permanent"
+
+        status = getattr(e, "status_code", None)
+        response = getattr(e, "response", None)
+        if status == None and response != None:
+            status = getattr(response, "status_code", None)
+
+        if status != None:
+            return "permanent" if status in self.PERMANENT_STATUS else "transient"
+
+        if isinstance(e, (OSError, TimeoutError)):
+            return "unreachable"
+
+        return "transient"
+
+    def dead_letter(self, group, e):
+        with open(self.failed_path, "a") as f:
+            for entry in group:
+                f.write(json.dumps(dict(entry, error=f"{e.__class__.__name__}: {e}")) + "\n")
+
+            f.flush()
+            os.fsync(f.fileno())
+
+        for entry in group:
+            self.attempts.pop(entry["id"], None)
+
+        self.journal.done([entry["id"] for entry in group])
+        logging.error(f"[{e.__class__.__name__}] Gave up on {len(group)} {self.__class__.__name__} entries, moved to {self.failed_path}: {e}")
+
+    def drain(self):
+        failed = False
+        pending = self.journal.pending()
+
+        for batch in range(0, len(pending), self.BATCH_SIZE):
+            for group in self.groups(pending[batch:batch + self.BATCH_SIZE]):
+                try:
+                    self.send(group)
+                except Exception as e:
+                    kind = self.classify(e)
+                    if kind == "unreachable":
+                        self.journal.sync()
+                        self.retry_later(e)
+                        return
+
+                    attempts = 1 + max(self.attempts.get(entry["id"], 0) for entry in group)
+                    if kind == "permanent" or attempts >= self.MAX_ATTEMPTS:
+                        self.dead_letter(group, e)
+                        continue
+
+                    for entry in group:
+                        self.attempts[entry["id"]] = attempts
+
+                    logging.warning(f"[{e.__class__.__name__}] Unable to send {self.__class__.__name__} entries (attempt {attempts}/{self.MAX_ATTEMPTS}): {e}")
+                    failed = True
+                    continue
+
+                for entry in group:
+                    self.attempts.pop(entry["id"], None)
+
+                self.journal.done([entry["id"] for entry in group])
+
+            self.journal.sync()
+
+        if failed:
+            self.retry_later()
+        else:
+            self.backoff = 0
+
+    def retry_later(self, e=None):
+        self.backoff = min(max(self.backoff * 2, self.BACKOFF_MIN), self.BACKOFF_MAX)
+        if e != None:
+            logging.warning(f"[{e.__class__.__name__}] Unable to reach Jira for {self.__class__.__name__} entries, retrying in {self.backoff}s")
+        else:
+            logging.warning(f"Retrying failed {self.__class__.__name__} entries in {self.backoff}s")
+
+    def run(self):
+        # With FLUSH_INTERVAL set, adds only wake the worker to sync the
+        # journal. They never push back the next drain, so a steady stream
+        # of entries is still sent every interval.
+        next_flush = None
+        if self.FLUSH_INTERVAL != None:
+            next_flush = time.monotonic() + self.FLUSH_INTERVAL
+
+        while True:
+            if self.backoff > 0:
+                timeout = self.backoff
+            elif next_flush != None:
+                timeout = max(next_flush - time.monotonic(), 0)
+            else:
+                timeout = None
+
+            woken = self.event.wait(timeout)
+            self.event.clear()
+
+            # Let appends arriving together share one fsync
+            if woken:
+                time.sleep(self.SYNC_DELAY)
+
+            try:
+                self.journal.sync()
+
+                if next_flush != None:
+                    if self.backoff == 0 and time.monotonic() < next_flush:
+                        continue
+
+                    next_flush = time.monotonic() + self.FLUSH_INTERVAL
+
+                self.drain()
+                self.journal.sync()
+
+                if self.journal.done_count >= self.COMPACT_AFTER or len(self.journal.pending()) == 0:
+                    if self.journal.done_count > 0:
+                        self.journal.compact()
+            except Exception as e:
+                logging.error(f"[{e.__class__.__name__}] {self.__class__.__name__} worker failed: {e}")
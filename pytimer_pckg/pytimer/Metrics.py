@@ -0,0 +1,125 @@
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# In process counters and latency histograms for the daemon's hot paths,
+# served by the METRICS command in the Prometheus text format. Metrics are
+# keyed on their name and labels and created on first use.
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+HELP = {
+    "pytimer_command_seconds": "Time to answer a request, by command",
+    "pytimer_request_errors_total": "Requests answered with an error, by command",
+    "pytimer_bytes_received_total": "Bytes read from clients",
+    "pytimer_bytes_sent_total": "Bytes written to clients",
+    "pytimer_status_cache_total": "STATUS renders served from the status cache or rendered",
+    "pytimer_timer_update_seconds": "Time spent rendering or updating a timer",
+    "pytimer_tmux_seconds": "Time spent running tmux commands, by transport",
+    "pytimer_persistence_seconds": "Time spent writing the state file",
+    "pytimer_jira_seconds": "Jira call latency, by method",
+    "pytimer_jira_errors_total": "Failed Jira calls, by method",
+}
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram == None:
+                histogram = Histogram()
+                self.histograms[key] = histogram
+
+            histogram.observe(seconds)
+
+    @contextmanager
+    def time(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def format_labels(self, labels, extra=()) -> str:
+        labels = list(labels) + list(extra)
+        if len(labels) == 0:
+            return ""
+
+        pairs = []
+        for key, value in labels:
+            value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+            pairs.append(f"{key}=\"{value}\"")
+
+        return "{" + ",".join(pairs) + "}"
+
+    def render(self) -> str:
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(((key, (list(h.counts), h.sum, h.count)) for key, h in self.histograms.items()), key=lambda item: item[0])
+
+        lines = []
+        described = set()
+
+        def describe(name, metric_type):
+            if name in described:
+                return
+
+            described.add(name)
+            if name in HELP:
+                lines.append(f"# HELP {name} {HELP[name]}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+        for (name, labels), value in counters:
+            describe(name, "counter")
+            lines.append(f"{name}{self.format_labels(labels)} {value}")
+
+        for (name, labels), (counts, total, count) in histograms:
+            describe(name, "histogram")
+
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS + ("+Inf",), counts):
+                cumulative += bucket
+                lines.append(f"{name}_bucket{self.format_labels(labels, [('le', bound)])} {cumulative}")
+
+            lines.append(f"{name}_sum{self.format_labels(labels)} {total}")
+            lines.append(f"{name}_count{self.format_labels(labels)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        # Written atomically so a textfile collector never reads half a file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+
+        os.replace(tmp_path, path)
+
+
+metrics = Registry()
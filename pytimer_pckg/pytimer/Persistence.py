@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import logging
+import threading
+from . import Runtime
+from .Metrics import metrics
+
+# One state file for every timer. Timers hand over a snapshot on every real
+# state transition and the store keeps the latest one per timer, so a burst
+# of transitions across any number of timers costs one write. The file is
+# written to a temp file, fsync'd and moved into place with os.replace(), so
+# a reader or a crash never sees a partial file. Until start() is called
+# snapshots are only collected, so loading any number of timers at startup
+# costs a single write once the writer runs.
+#
+# Snapshots from the previous run that no timer claims, e.g. a timer left
+# out of the config for now or every timer when the config failed to load,
+# are written back unchanged. They are only dropped by an explicit remove().
+class StateStore:
+    def __init__(self, path, delay=0.5):
+        self.path = path
+        self.delay = delay
+        self.timers = {}
+        self.saved = None
+        # Legacy status files imported into saved, by timer name
+        self.legacy = {}
+        self.dirty = False
+        self.lock = threading.RLock()
+        self.write_lock = threading.Lock()
+        self.event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread != None:
+            return
+
+        # Legacy files are only migrated for the timers loaded at startup,
+        # not for timers added later on
+        self.load_saved()
+        with self.lock:
+            for name in self.legacy:
+                self.saved.pop(name, None)
+
+            self.legacy = {}
+
+        self.thread = threading.Thread(target=self.run, name="pytimer-writer", daemon=True)
+        self.thread.start()
+
+        if self.dirty:
+            self.event.set()
+
+    def load(self) -> dict:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)["timers"]
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logging.error(f"[{e.__class__.__name__}] Unable to read state file {self.path}")
+            return {}
+
+    def load_saved(self):
+        # Must happen before the first write replaces the previous run's file
+        with self.lock:
+            if self.saved == None:
+                self.saved = self.load()
+                self.import_legacy()
+
+    def restore(self, name):
+        # Each snapshot saved by the previous run is handed out once
+        self.load_saved()
+        with self.lock:
+            snapshot = self.saved.pop(name, None)
+            path = self.legacy.pop(name, None)
+
+        # Migrated now, the state file has it from here on
+        if path != None:
+            os.unlink(path)
+            logging.info(f"Imported legacy status file {path}")
+
+        return snapshot
+
+    def import_legacy(self):
+        # Timers used to be saved to a <name>.json file each. The state file
+        # wins over a legacy file for the same timer.
+        directory = os.path.dirname(self.path)
+        try:
+            file_names = os.listdir(directory)
+        except FileNotFoundError:
+            return
+
+        for file_name in file_names:
+            name, ext = os.path.splitext(file_name)
+            path = f"{directory}/{file_name}"
+            if ext != ".json" or path == self.path or name in self.saved:
+                continue
+
+            try:
+                with open(path, "r") as f:
+                    snapshot = json.load(f)
+            except Exception as e:
+                logging.warning(f"[{e.__class__.__name__}] Unable to import legacy status file {path}, leaving it in place")
+                continue
+
+            # Other files live here too, e.g. the old comment queue
+            if type(snapshot) != dict or "state" not in snapshot:
+                continue
+
+            self.saved[name] = snapshot
+            self.legacy[name] = path
+
+    def schedule(self, name, status: dict):
+        with self.lock:
+            self.timers[name] = status
+            self.dirty = True
+
+        self.wake()
+
+    def remove(self, name) -> bool:
+        self.load_saved()
+        with self.lock:
+            removed = self.timers.pop(name, None) != None
+            if self.saved.pop(name, None) != None:
+                removed = True
+
+            if not removed:
+                return False
+
+            self.dirty = True
+
+        self.wake()
+
+        return True
+
+    def wake(self):
+        # Before start() the change is picked up by the first write
+        if self.thread != None:
+            self.event.set()
+
+    def flush(self):
+        self.load_saved()
+
+        with self.write_lock:
+            with self.lock:
+                if not self.dirty:
+                    return
+
+                timers = dict(self.saved)
+                timers.update(self.timers)
+                state = {"timers": timers}
+                self.dirty = False
+
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with metrics.time("pytimer_persistence_seconds"):
+                    with open(tmp_path, "w") as f:
+                        json.dump(state, f, indent=2)
+                        f.flush()
+                        os.fsync(f.fileno())
+
+                    os.replace(tmp_path, self.path)
+            except Exception as e:
+                logging.error(f"[{e.__class__.__name__}] Unable to write state file {self.path}")
+                with self.lock:
+                    self.dirty = True
+
+    def run(self):
+        while True:
+            self.event.wait()
+            # Give other transitions in the same burst a chance to land
+            time.sleep(self.delay)
+            self.event.clear()
+            self.flush()
+
+
+store = StateStore(f"{Runtime.RUNTIME_DIR}/state.json")
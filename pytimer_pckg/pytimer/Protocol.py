@@ -0,0 +1,106 @@
+import struct
+
+# Wire protocol between the clients and the daemon. Every frame is an
+# 8 byte header followed by a UTF-8 body:
+#
+#   body length (u32) | request id (u16) | frame type (u8) | flags (u8)
+#
+# A REQUEST body holds the command, timer and optional value separated by
+# NUL, so values may contain spaces and semicolons. The daemon answers a
+# request with SYN_ACK (only when FLAG_BLOCK is set) and then either ACK,
+# whose body holds the response values separated by NUL, or ERROR.
+HEADER = struct.Struct("!IHBB")
+
+REQUEST = 1
+SYN_ACK = 2
+ACK = 3
+ERROR = 4
+
+FLAG_BLOCK = 1
+
+SEP = "\0"
+
+def encode_frame(frame_type, req_id, body=b"", flags=0) -> bytes:
+    return HEADER.pack(len(body), req_id, frame_type, flags) + body
+
+
+def encode_request(req_id, cmd, timer=None, value=None, block=False) -> bytes:
+    fields = [cmd, timer or ""]
+    if value != None:
+        fields.append(value)
+
+    flags = FLAG_BLOCK if block else 0
+
+    return encode_frame(REQUEST, req_id, SEP.join(fields).encode(), flags=flags)
+
+
+def decode_request(body) -> dict:
+    fields = bytes(body).decode().split(SEP, 2)
+    if len(fields) < 2:
+        raise ValueError("Malformed request")
+
+    return {
+        "cmd": fields[0],
+        "timer": fields[1] if len(fields[1]) > 0 else None,
+        "value": fields[2] if len(fields) == 3 else None
+    }
+
+
+def encode_values(values) -> bytes:
+    return SEP.join(values).encode()
+
+
+def decode_values(body) -> list:
+    if len(body) == 0:
+        return []
+
+    return bytes(body).decode().split(SEP)
+
+
+# Reads frames from a blocking socket. Data is received with recv_into into
+# one reusable buffer, which grows only when a frame does not fit. Several
+# frames may arrive in a single read.
+class FrameReader:
+    def __init__(self, sock, size=4096):
+        self.sock = sock
+        self.buffer = bytearray(size)
+        self.start = 0
+        self.end = 0
+
+    def fill(self, needed):
+        if self.end - self.start >= needed:
+            return True
+
+        # Move what is left to the front, growing the buffer if needed
+        if self.start > 0:
+            remaining = self.end - self.start
+            self.buffer[:remaining] = self.buffer[self.start:self.end]
+            self.start = 0
+            self.end = remaining
+
+        if len(self.buffer) < needed:
+            self.buffer.extend(bytearray(needed - len(self.buffer)))
+
+        view = memoryview(self.buffer)
+        while self.end < needed:
+            received = self.sock.recv_into(view[self.end:])
+            if received == 0:
+                return False
+
+            self.end += received
+
+        return True
+
+    def read_frame(self):
+        if not self.fill(HEADER.size):
+            return None
+
+        length, req_id, frame_type, flags = HEADER.unpack_from(self.buffer, self.start)
+        if not self.fill(HEADER.size + length):
+            return None
+
+        body_start = self.start + HEADER.size
+        body = bytes(self.buffer[body_start:body_start + length])
+        self.start = body_start + length
+
+        return frame_type, req_id, flags, body
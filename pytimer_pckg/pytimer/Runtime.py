@@ -0,0 +1,10 @@
+import os
+
+# Where the daemon keeps its socket, log, state file, Jira journals and
+# status segment. Set PYTIMER_RUNTIME_DIR to run a separate daemon, e.g. the
+# benchmarks' sandbox, without touching the user's data. Read once on import,
+# scripts/pytimer_status.py repeats this without importing pytimer.
+RUNTIME_DIR = os.environ.get("PYTIMER_RUNTIME_DIR", "/tmp/tmux-pytimer")
+DAEMON_DIR = f"{RUNTIME_DIR}/daemon"
+SOCKET_PATH = f"{DAEMON_DIR}/pytimer.sock"
+LOG_PATH = f"{DAEMON_DIR}/daemon.log"
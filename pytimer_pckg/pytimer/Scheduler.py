@@ -0,0 +1,88 @@
+import time
+import heapq
+import logging
+import threading
+
+# Fires phase transitions when a timer's time_end is reached instead of
+# waiting for a status refresh to notice. Deadlines sit in a heap keyed on
+# time_end. Rescheduling a timer leaves its old entry in the heap, and popped
+# entries that no longer match the timer's current deadline are skipped.
+# A deadline whose fire() raised is retried after RETRY_DELAY seconds.
+class DeadlineScheduler:
+    RETRY_DELAY = 5
+
+    def __init__(self, fire):
+        self.fire = fire
+        self.heap = []
+        self.scheduled = {}
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def start(self):
+        if self.thread != None:
+            return
+
+        self.thread = threading.Thread(target=self.run, name="pytimer-scheduler", daemon=True)
+        self.thread.start()
+
+    def schedule(self, timer):
+        deadline = timer.phase_end()
+
+        with self.condition:
+            if deadline == None:
+                self.scheduled.pop(timer.name, None)
+                return
+
+            if self.scheduled.get(timer.name) == deadline:
+                return
+
+            self.scheduled[timer.name] = deadline
+            heapq.heappush(self.heap, (deadline, timer.name))
+            self.condition.notify()
+
+    def retry(self, name):
+        with self.condition:
+            # Unless it was rescheduled or removed in the meantime
+            if name in self.scheduled:
+                return
+
+            deadline = time.time() + self.RETRY_DELAY
+            self.scheduled[name] = deadline
+            heapq.heappush(self.heap, (deadline, name))
+            self.condition.notify()
+
+    def unschedule(self, name):
+        with self.condition:
+            self.scheduled.pop(name, None)
+
+    def pop_due(self):
+        with self.condition:
+            while True:
+                if len(self.heap) == 0:
+                    self.condition.wait()
+                    continue
+
+                deadline, name = self.heap[0]
+                if self.scheduled.get(name) != deadline:
+                    heapq.heappop(self.heap)
+                    continue
+
+                timeout = deadline - time.time()
+                if timeout > 0:
+                    self.condition.wait(timeout)
+                    continue
+
+                heapq.heappop(self.heap)
+                del self.scheduled[name]
+
+                return name
+
+    def run(self):
+        while True:
+            name = self.pop_due()
+
+            try:
+                self.fire(name)
+            except Exception as e:
+                logging.error(f"[{e.__class__.__name__}] Unable to fire deadline for {name}, retrying in {self.RETRY_DELAY}s: {e}")
+                self.retry(name)
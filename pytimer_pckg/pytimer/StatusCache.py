@@ -0,0 +1,29 @@
+# The rendered STATUS response. Every transition bumps the generation with
+# invalidate(), and between transitions the status only changes at the next
+# deadline of a running timer (a minute boundary or a phase end). A hit is a
+# generation and a clock comparison, however many timers there are.
+class StatusCache:
+    def __init__(self):
+        self.generation = 0
+        self.payload = None
+        self.payload_generation = None
+        self.expires = None
+
+    def get(self, now):
+        if self.payload_generation != self.generation:
+            return None
+
+        if self.expires != None and now >= self.expires:
+            return None
+
+        return self.payload
+
+    def put(self, generation, payload: bytes, expires):
+        # generation is read before rendering, a transition during the
+        # render leaves the entry stale
+        self.payload = payload
+        self.payload_generation = generation
+        self.expires = expires
+
+    def invalidate(self):
+        self.generation += 1
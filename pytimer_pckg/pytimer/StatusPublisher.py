@@ -0,0 +1,67 @@
+import time
+import logging
+import threading
+from pytimer import TmuxHelper
+
+# Publishes the rendered status whenever it changes: into the shared status
+# segment read by pytimer_status.py and, in push mode, into a tmux global
+# option so the status line can reference #{@pytimer_status} instead of
+# polling the daemon. The thread sleeps until the next deadline reported by
+# the daemon (a minute boundary or a timer's time_end) or until wake() is
+# called after a transition.
+class StatusPublisher:
+    OPTION = "@pytimer_status"
+    MAX_SLEEP = 60
+
+    def __init__(self, render, deadlines, segment=None, push=False):
+        self.render = render
+        self.deadlines = deadlines
+        self.segment = segment
+        self.push = push
+        self.event = threading.Event()
+        self.status = None
+        self.thread = None
+
+    def start(self):
+        if self.thread != None:
+            return
+
+        self.thread = threading.Thread(target=self.run, name="pytimer-publisher", daemon=True)
+        self.thread.start()
+
+    def wake(self):
+        self.event.set()
+
+    def publish(self):
+        status = self.render()
+        if status == self.status:
+            return
+
+        if self.segment != None:
+            self.segment.publish(status)
+
+        if self.push:
+            TmuxHelper.set_status_option(self.OPTION, status)
+
+        self.status = status
+        logging.debug("Published status: %s", status)
+
+    def get_timeout(self):
+        deadlines = self.deadlines()
+        if len(deadlines) == 0:
+            return self.MAX_SLEEP
+
+        # Deadlines are whole seconds, land just after the second ticks over
+        timeout = min(deadlines) - time.time() + 0.05
+
+        return min(max(timeout, 0), self.MAX_SLEEP)
+
+    def run(self):
+        while True:
+            try:
+                self.publish()
+            except Exception as e:
+                logging.error(f"[{e.__class__.__name__}] Unable to publish status")
+
+            self.event.wait(self.get_timeout())
+            self.event.clear()
@@ -0,0 +1,116 @@
+import os
+import mmap
+import struct
+import logging
+import threading
+from . import Runtime
+
+# The rendered status published in a small memory mapped file, so a status
+# line client can read it without a socket round trip or waking the daemon.
+#
+#   magic (4s) | sequence (u32) | daemon pid (u32) | length (u32) | status
+#
+# The sequence is a seqlock and doubles as the version counter. It is odd
+# while the daemon is writing, so a reader retries when it sees an odd value
+# or when the sequence changed while it copied the status. A pid of 0 means
+# the daemon shut down, readers then fall back to the STATUS command.
+HEADER = struct.Struct("=4sIII")
+MAGIC = b"PYTS"
+SIZE = mmap.PAGESIZE
+
+PATH = f"{Runtime.RUNTIME_DIR}/status.shm"
+
+class StatusSegment:
+    def __init__(self, path=PATH):
+        self.path = path
+        self.map = None
+        self.sequence = 0
+        self.lock = threading.Lock()
+
+    def open(self):
+        if self.map != None:
+            return
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, SIZE)
+            self.map = mmap.mmap(fd, SIZE)
+        finally:
+            os.close(fd)
+
+        # Nothing published yet, readers fall back to the socket
+        HEADER.pack_into(self.map, 0, MAGIC, self.sequence, 0, 0)
+
+    def publish(self, status: str):
+        data = status.encode()
+
+        with self.lock:
+            if self.map == None:
+                return
+
+            # Grow the file when the status does not fit. Readers mapping the
+            # old size see a length past their mapping and fall back.
+            if HEADER.size + len(data) > len(self.map):
+                size = (HEADER.size + len(data) + SIZE - 1) // SIZE * SIZE
+                self.map.resize(size)
+                logging.info(f"Resized status segment to {size} bytes")
+
+            self.sequence += 1
+            struct.pack_into("=I", self.map, 4, self.sequence)
+
+            HEADER.pack_into(self.map, 0, MAGIC, self.sequence, os.getpid(), len(data))
+            self.map[HEADER.size:HEADER.size + len(data)] = data
+
+            self.sequence += 1
+            struct.pack_into("=I", self.map, 4, self.sequence)
+
+    def close(self):
+        with self.lock:
+            if self.map == None:
+                return
+
+            self.sequence += 2
+            HEADER.pack_into(self.map, 0, MAGIC, self.sequence, 0, 0)
+            self.map.close()
+            self.map = None
+
+
+def read(path=PATH, retries=3):
+    # Returns the published status, or None when the daemon is not
+    # publishing and the caller should ask over the socket
+    try:
+        with open(path, "rb") as f:
+            segment = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    with segment:
+        return read_segment(segment, retries=retries)
+
+
+def read_segment(segment, retries=3):
+    for _ in range(retries):
+        magic, sequence, pid, length = HEADER.unpack_from(segment, 0)
+        if magic != MAGIC or pid == 0:
+            return None
+
+        if sequence % 2 == 1 or HEADER.size + length > len(segment):
+            continue
+
+        data = segment[HEADER.size:HEADER.size + length]
+        if struct.unpack_from("=I", segment, 4)[0] != sequence:
+            continue
+
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return None
+        except PermissionError:
+            pass
+
+        return data.decode()
+
+    return None
+
+
+segment = StatusSegment()
@@ -0,0 +1,67 @@
+import time
+import logging
+import threading
+
+# Jira tickets for the Set Task menu. Served from memory and refreshed in the
+# background once older than ttl seconds (stale-while-revalidate). Only a
+# cold cache queries Jira on the caller's thread.
+class TicketCache:
+    def __init__(self, fetch, ttl=300):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.tickets = None
+        self.fetched = 0
+        self.refreshing = False
+        self.lock = threading.Lock()
+
+    def get(self) -> list:
+        if self.tickets == None:
+            return self.refresh()
+
+        if time.monotonic() - self.fetched > self.ttl:
+            self.prefetch()
+
+        return self.tickets
+
+    def refresh(self) -> list:
+        tickets = self.fetch()
+
+        with self.lock:
+            self.tickets = tickets
+            self.fetched = time.monotonic()
+
+        logging.debug("Fetched %d tickets", len(tickets))
+        return tickets
+
+    def prefetch(self):
+        with self.lock:
+            if self.refreshing:
+                return
+
+            self.refreshing = True
+
+        threading.Thread(target=self.run, name="pytimer-tickets", daemon=True).start()
+
+    def invalidate(self):
+        self.fetched = 0
+
+    def run(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logging.warning(f"[{e.__class__.__name__}] Unable to refresh tickets: {e}")
+        finally:
+            with self.lock:
+                self.refreshing = False
+
+
+# Timers running the same query against the same client share a cache. The
+# key names the query and client, so building the cache does not need
+# jira_lib.
+caches = {}
+
+def get_cache(key, fetch, ttl=300) -> TicketCache:
+    if key not in caches:
+        caches[key] = TicketCache(fetch, ttl=ttl)
+
+    return caches[key]
@@ -0,0 +1,55 @@
+import bisect
+import itertools
+
+# The daemon's timers, looked up by name in O(1) and iterated in priority
+# order. The order is kept on add() and remove() so STATUS never sorts.
+# Timers with the same priority keep the order they were added in.
+class TimerIndex:
+    def __init__(self, timers=[]):
+        self.by_name = {}
+        self.sort_keys = {}
+        self.order = []
+        self.keys_order = []
+        self.counter = itertools.count()
+
+        for timer in timers:
+            self.add(timer)
+
+    def add(self, timer):
+        if timer.name in self.by_name:
+            raise Exception(f"A timer named {timer.name} already exists")
+
+        key = (timer.priority, next(self.counter))
+        position = bisect.bisect(self.keys_order, key)
+
+        self.keys_order.insert(position, key)
+        self.order.insert(position, timer)
+        self.by_name[timer.name] = timer
+        self.sort_keys[timer.name] = key
+
+    def remove(self, name):
+        timer = self.by_name.pop(name)
+        position = bisect.bisect_left(self.keys_order, self.sort_keys.pop(name))
+
+        del self.order[position]
+        del self.keys_order[position]
+
+        return timer
+
+    def get(self, name, default=None):
+        return self.by_name.get(name, default)
+
+    def __getitem__(self, name):
+        return self.by_name[name]
+
+    def __contains__(self, name):
+        return name in self.by_name
+
+    def __len__(self):
+        return len(self.order)
+
+    def keys(self) -> list:
+        return [timer.name for timer in self.order]
+
+    def values(self) -> list:
+        return self.order
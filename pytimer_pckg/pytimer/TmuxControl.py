@@ -0,0 +1,90 @@
+import logging
+import threading
+import subprocess
+from concurrent.futures import Future
+
+# A long lived `tmux -C` client. Commands are written to its stdin and answered
+# in order with %begin/%end (or %error) blocks, so several commands can be
+# pipelined and their replies matched up without a fork per command.
+class ControlClient:
+    def __init__(self, tmux="/usr/local/bin/tmux"):
+        self.tmux = tmux
+        self.lock = threading.Lock()
+        self.pending = []
+        self.alive = False
+        self.proc = None
+
+    def start(self):
+        # ignore-size keeps this client from shrinking windows and no-output
+        # stops tmux from streaming pane output we never read
+        self.proc = subprocess.Popen(
+            [self.tmux, "-C", "attach-session", "-f", "ignore-size,no-output"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self.alive = True
+
+        threading.Thread(target=self.read, name="pytimer-tmux-control", daemon=True).start()
+
+    def close(self):
+        self.alive = False
+        if self.proc != None:
+            self.proc.terminate()
+
+    def quote(self, arg) -> str:
+        arg = str(arg).replace("\\", "\\\\").replace("\"", "\\\"").replace("$", "\\$")
+
+        return f"\"{arg}\""
+
+    def send(self, *cmds) -> list:
+        lines = []
+        futures = []
+        for cmd in cmds:
+            lines.append(" ".join(self.quote(arg) for arg in cmd) + "\n")
+            futures.append(Future())
+
+        with self.lock:
+            if not self.alive:
+                raise ConnectionError("tmux control client is not running")
+
+            self.pending += futures
+            self.proc.stdin.write("".join(lines).encode())
+            self.proc.stdin.flush()
+
+        return futures
+
+    def run(self, *cmds, timeout=5) -> list:
+        return [future.result(timeout=timeout) for future in self.send(*cmds)]
+
+    def read(self):
+        output = None
+        for line in self.proc.stdout:
+            line = line.decode(errors="replace").rstrip("\n")
+
+            if output == None:
+                # Blocks flagged 0 answer commands this client did not send,
+                # such as the initial attach-session
+                if line.startswith("%begin ") and line.endswith(" 1"):
+                    output = []
+                continue
+
+            if line.startswith("%end ") or line.startswith("%error "):
+                with self.lock:
+                    future = self.pending.pop(0) if len(self.pending) > 0 else None
+
+                if future != None:
+                    if line.startswith("%end "):
+                        future.set_result(output)
+                    else:
+                        future.set_exception(RuntimeError("\n".join(output)))
+
+                output = None
+            else:
+                output.append(line)
+
+        logging.warning("tmux control client exited")
+        with self.lock:
+            self.alive = False
+            pending = self.pending
+            self.pending = []
+
+        for future in pending:
+            future.set_exception(ConnectionError("tmux control client exited"))
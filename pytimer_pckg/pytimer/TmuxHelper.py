@@ -1,12 +1,41 @@
 import os
+import shutil
+import logging
 import subprocess
+from .TmuxControl import ControlClient
+from .Metrics import metrics
+
+# Long lived control mode client used by the daemon, see start_control()
+control = None
+
+# Resolved once per process
+plugin_dir = None
+tmux = None
 
 def get_plugin_dir():
-    path = os.path.dirname(os.path.realpath(__file__))
-    path = path.split('.tmux')[0]
-    path = f"{path}.tmux/plugins/tmux-pytimer"
+    global plugin_dir
+
+    if plugin_dir == None:
+        path = os.path.dirname(os.path.realpath(__file__))
+        path = path.split('.tmux')[0]
+        plugin_dir = f"{path}.tmux/plugins/tmux-pytimer"
+
+    return plugin_dir
+
+
+def get_tmux():
+    global tmux
+
+    if tmux == None:
+        tmux = shutil.which("tmux") or "/usr/local/bin/tmux"
+
+    return tmux
 
-    return path
+
+def resolve_environment():
+    get_plugin_dir()
+    get_tmux()
+    logging.info(f"Resolved plugin dir {plugin_dir} and tmux {tmux}")
 
 
 def menu_add_option(name, key, cmd):
@@ -15,27 +44,72 @@ def menu_add_option(name, key, cmd):
     return entry
 
 
-def get_terminal_size():
-    term_height = subprocess.run(["/usr/local/bin/tmux", "display-message", "-p", "#{window_height}"], capture_output=True)
-    term_width = subprocess.run(["/usr/local/bin/tmux", "display-message", "-p", "#{window_width}"], capture_output=True)
+def start_control():
+    global control
+
+    client = ControlClient(tmux=get_tmux())
+    try:
+        client.start()
+    except OSError as e:
+        logging.warning(f"[{e.__class__.__name__}] Unable to start tmux control client")
+        return
+
+    control = client
+
+
+def run(*cmds) -> list:
+    # Runs tmux commands and returns the output lines of each. Commands are
+    # pipelined through the control client when it is running.
+    if control != None and control.alive:
+        try:
+            with metrics.time("pytimer_tmux_seconds", transport="control"):
+                return control.run(*cmds)
+        except Exception as e:
+            logging.warning(f"[{e.__class__.__name__}] tmux control client failed, falling back to subprocess")
+
+    outputs = []
+    for cmd in cmds:
+        with metrics.time("pytimer_tmux_seconds", transport="subprocess"):
+            result = subprocess.run([get_tmux()] + cmd, capture_output=True)
+        outputs.append(result.stdout.decode().splitlines())
+
+    return outputs
 
-    term_height = term_height.stdout.rstrip()
-    term_height = int(term_height)
-    term_width = term_width.stdout.rstrip()
-    term_width = int(term_width)
 
-    return term_height, term_width
+def get_popup_client():
+    # The client the user was active on last and the size of its window.
+    # Clients can have different sizes, so this is asked for every popup,
+    # one round trip through the control client.
+    clients = run(["list-clients", "-F", "#{client_control_mode} #{client_activity} #{window_height} #{window_width} #{client_name}"])[0]
 
+    popup_client = None
+    activity = -1
+    for client in clients:
+        control_mode, client_activity, term_height, term_width, name = client.split(" ", 4)
+        if control_mode == "0" and int(client_activity) > activity:
+            activity = int(client_activity)
+            popup_client = (name, int(term_height), int(term_width))
+
+    return popup_client
+
+
+# Messages, popups and menus need a real client to draw on, so they are not
+# sent through the control client
 
 def message_create(msg, delay=5000):
-    cmd = ["/usr/local/bin/tmux", "display-message", "-d", f"{delay}", msg]
+    cmd = [get_tmux(), "display-message", "-d", f"{delay}", msg]
     subprocess.run(cmd)
 
     return 0
 
 
 def popup_create(title, msg, x_pos="C", y_pos="C", height=50, width=50, input=False):
-    term_height, term_width = get_terminal_size()
+    popup_client = get_popup_client()
+    if popup_client == None:
+        logging.warning(f"No tmux client to show the {title} popup on")
+        return
+
+    client_name, term_height, term_width = popup_client
     if term_height % 2 == 0:
         term_height += 1
 
@@ -45,17 +119,17 @@ def popup_create(title, msg, x_pos="C", y_pos="C", height=50, width=50, input=Fa
     term_height = int(term_height * (height/100)) + 1
     term_width = int(term_width * (width/100)) + 1
     if input:
-        cmd = f"/usr/local/bin/tmux display-popup -S fg=#fe8019 -h {term_height} -w {term_width} -x {x_pos} -y {y_pos} -E"
+        cmd = f"{get_tmux()} display-popup -S fg=#fe8019 -h {term_height} -w {term_width} -x {x_pos} -y {y_pos} -E"
 
         cmd = cmd.split(' ')
-        cmd += ["-T", f"#[fg=#ebdbb2]{title}"]
+        cmd += ["-c", client_name, "-T", f"#[fg=#ebdbb2]{title}"]
         cmd.append(f"read response; {msg}")
     else:
         vert_padding = '\n'*(int((term_height/2)) - 1)
-        cmd = f"/usr/local/bin/tmux display-popup -S fg=#fe8019,align=centre -h {term_height} -w {term_width} -x {x_pos} -y {y_pos}"
+        cmd = f"{get_tmux()} display-popup -S fg=#fe8019,align=centre -h {term_height} -w {term_width} -x {x_pos} -y {y_pos}"
 
         cmd = cmd.split(' ')
-        cmd += ["-T", f"#[fg=#ebdbb2]{title}"]
+        cmd += ["-c", client_name, "-T", f"#[fg=#ebdbb2]{title}"]
         cmd += ["echo", "-n", f"\a\a\a{vert_padding}{msg.center(term_width)}"]
 
     subprocess.run(cmd)
@@ -64,7 +138,7 @@ def popup_create(title, msg, x_pos="C", y_pos="C", height=50, width=50, input=Fa
 
 
 def menu_create(title, pos_x, pos_y, options):
-    cmd = f"/usr/local/bin/tmux display-menu -y {pos_y} -x {pos_x} -T"
+    cmd = f"{get_tmux()} display-menu -y {pos_y} -x {pos_x} -T"
     cmd = cmd.split(' ')
     cmd.append(title)
 
@@ -75,7 +149,41 @@ def menu_create(title, pos_x, pos_y, options):
 
 
 def refresh():
-    cmd = "tmux refresh-client -S"
-    cmd = cmd.split(' ')
+    if control == None or not control.alive:
+        cmd = f"{get_tmux()} refresh-client -S"
+        cmd = cmd.split(' ')
 
-    subprocess.run(cmd)
+        with metrics.time("pytimer_tmux_seconds", transport="subprocess"):
+            subprocess.run(cmd)
+        return
+
+    # refresh-client without a target would only redraw the control client
+    clients = run(["list-clients", "-F", "#{client_control_mode} #{client_name}"])[0]
+    cmds = []
+    for client in clients:
+        control_mode, name = client.split(" ", 1)
+        if control_mode == "0":
+            cmds.append(["refresh-client", "-S", "-t", name])
+
+    if len(cmds) > 0:
+        run(*cmds)
+
+
+def get_option(name, default=None):
+    value = run(["show-option", "-gqv", name])[0]
+    if len(value) == 0:
+        return default
+
+    return value[0]
+
+
+def set_status_option(name, value):
+    if control == None or not control.alive:
+        # Set the option and redraw the status line with a single tmux invocation
+        cmd = [get_tmux(), "set-option", "-g", name, value, ";", "refresh-client", "-S"]
+        with metrics.time("pytimer_tmux_seconds", transport="subprocess"):
+            subprocess.run(cmd, capture_output=True)
+        return
+
+    run(["set-option", "-g", name, value])
+    refresh()
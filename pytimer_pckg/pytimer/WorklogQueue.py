@@ -0,0 +1,34 @@
+from datetime import datetime
+from . import JiraClient, Runtime
+from .Journal import JournalQueue
+
+# Work sessions are journaled as they end and uploaded to Jira in bulk every
+# FLUSH_INTERVAL seconds. Consecutive sessions on the same ticket that are at
+# most MERGE_GAP seconds apart (a pause or a short break) become one worklog,
+# as long as they are sent with the same verify_tls setting.
+class WorklogQueue(JournalQueue):
+    FLUSH_INTERVAL = 300
+    MERGE_GAP = 15*60
+
+    def groups(self, pending) -> list:
+        groups = []
+        for entry in sorted(pending, key=lambda entry: (entry["key"], entry["verify_tls"], entry["started"])):
+            if len(groups) > 0:
+                last = groups[-1][-1]
+                if last["key"] == entry["key"] and last["verify_tls"] == entry["verify_tls"] and entry["started"] - (last["started"] + last["seconds"]) <= self.MERGE_GAP:
+                    groups[-1].append(entry)
+                    continue
+
+            groups.append([entry])
+
+        return groups
+
+    def send(self, group):
+        seconds = sum(entry["seconds"] for entry in group)
+        started = datetime.fromtimestamp(group[0]["started"])
+
+        client = JiraClient.get_client(verify_tls=group[0]["verify_tls"])
+        client.add_worklog(group[0]["key"], started=started, time_spent_seconds=seconds)
+
+
+worklogs = WorklogQueue(f"{Runtime.RUNTIME_DIR}/jira-worklogs.jsonl")
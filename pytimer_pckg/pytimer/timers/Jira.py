@@ -1,11 +1,12 @@
-import json
 from datetime import datetime
-from jira_lib import Jira, JiraFields
-from .. import TmuxHelper
+from functools import partial
+from .. import TmuxHelper, Persistence, Effects, TicketCache, JiraClient, CommentQueue, WorklogQueue
 from .states import JiraStates
 
 class JiraTimer:
-    # TODO implement loading from file
+    # Built by tickets_query(), jira_lib is only imported once Jira is used
+    TICKETS_QUERY = None
+
     # TODO add timeout to popup so that timers continue if away
         # TODO Add a carry_over time property that uses the exta time passed the session in a future break or subtract from a future work session. Maybe use the tmux display-popup -E option.
     def __init__(self, name="Jira", priority=0, time_work=60, 
@@ -25,20 +26,48 @@ class JiraTimer:
         self.task_time = 0
         self.verify_tls=verify_tls
 
-        with open(f"{TmuxHelper.get_plugin_dir()}/scripts/jira.key", "r") as f:
-            self.jira = Jira(f.read().rstrip(), verify_tls=verify_tls)
+        # Every Jira timer runs the same query, timers with the same TLS
+        # setting share the tickets
+        self.tickets = TicketCache.get_cache(("JiraTimer", verify_tls), partial(fetch_tickets, verify_tls))
 
-        self.state = JiraStates.Idle(self)
+        self.states = {}
+        self.state = JiraStates.get_state(self, "Idle")
 
         self.write_status()
 
     def get_status(self) -> str: 
         return self.state.status
 
+    def is_due(self, now) -> bool:
+        return now >= self.time_end and str(self.state) in ["Working", "BreakLong", "BreakShort"]
+
+    # When the current phase rolls over, None while idle or paused
+    def phase_end(self):
+        if str(self.state) not in ["Working", "BreakLong", "BreakShort"]:
+            return None
+
+        return self.time_end
+
+    # Next time the rendered status changes, either a minute boundary or
+    # the end of the current phase
+    def next_deadline(self, now):
+        if str(self.state) not in ["Working", "BreakLong", "BreakShort"]:
+            return None
+
+        # Overdue, the scheduler rolls the phase over and wakes the publisher.
+        # Never in the past, that would have the publisher spin until then.
+        time_left = self.time_end - now
+        if time_left <= 0:
+            return now + 1
+
+        return now + min(time_left % 60 + 1, time_left)
+
     def gen_menu(self):
-        TmuxHelper.menu_create(self.name, "R", "S", self.state.menu_options)
+        Effects.effects.spawn(TmuxHelper.menu_create, self.name, "R", "S", self.state.get_menu_options(self))
 
     def pause(self):
+        # Resuming starts a new session, so log the one that was paused
+        self.log_work()
         self.state = self.state.pause(self)
 
         self.write_status()
@@ -54,7 +83,8 @@ class JiraTimer:
 
     def start(self):
         if self.task == None:
-            self.gen_tickets_menu()
+            # Queries Jira and waits on the menu, so run it on its own thread
+            Effects.effects.spawn(self.gen_tickets_menu)
 
         self.state.next(self)
 
@@ -74,21 +104,38 @@ class JiraTimer:
         self.task = task_key
         self.state.update(self)
 
-    def comment(self, comment):
+        self.write_status()
+
+    def comment(self, comment, task=None):
+        if task == None:
+            task = self.task
+
         if type(comment) != str:
             raise Exception(f"{self.name}: Comment message was not provided")
 
-        if type(self.task) != str:
+        if type(task) != str or len(task) == 0:
             raise Exception(f"{self.name}: Issue key was not provided for comment")
 
         if len(comment) == 0:
             return
 
-        self.jira.add_comment(self.task, comment)
+        # Sent by the comment queue's worker, retried if Jira is unreachable
+        CommentQueue.comments.add({"timestamp": str(datetime.now()), "key": task, "comment": comment, "verify_tls": self.verify_tls})
 
-    #TODO
     def log_work(self):
-        pass
+        # Only time spent working on a task is logged. The upload is
+        # buffered and coalesced by the worklog queue.
+        if str(self.state) != "Working" or self.task == None:
+            return
+
+        now = int(datetime.now().strftime("%s"))
+        seconds = min(now, self.time_end) - self.time_start
+
+        # Jira does not accept worklogs under a minute
+        if seconds < 60:
+            return
+
+        WorklogQueue.worklogs.add({"key": self.task, "started": self.time_start, "seconds": seconds, "verify_tls": self.verify_tls})
 
     def verify_state(self, state):
         if type(state["name"]) != str:
@@ -102,8 +149,8 @@ class JiraTimer:
         if state["name"] not in mod_classes:
             return False
                                                                       
-        # Returns an instantiation of the matched class
-        return JiraStates.STATES[state["name"]](self)
+        # Returns this timer's instance of the matched class
+        return JiraStates.get_state(self, state["name"])
                                                                       
 
     def verify_time_end(self, time_end):
@@ -132,12 +179,10 @@ class JiraTimer:
 
         return iteration
 
-    def read_status(self):
-        try:
-            with open(f"/tmp/tmux-pytimer/{self.name}.json", "r") as f:
-                status = json.load(f)
-        except Exception as e:
-            raise Exception(f"Unable to access {self.name} status file")
+    def read_status(self, status: dict):
+        # Restores a snapshot taken by get_snapshot(), falling back to Idle
+        if type(status) != dict:
+            raise Exception(f"Unable to read {self.name} status, expected a dict")
 
         fail_flag = False
         try:
@@ -165,55 +210,61 @@ class JiraTimer:
             # Validate state
             state = self.verify_state(status["state"])
             if state != False:
-                if str(state) != str(self.state):
-                    self.state = state
-                else:
-                    del state
-
+                self.state = state
                 self.state.restore_properties(self, status["state"]["properties"])
             else:
                 fail_flag = True
 
         except:
-            raise Exception(f"Unable to read status {self.name} status file")
+            fail_flag = True
+            raise Exception(f"Unable to read {self.name} status")
         finally:
             if fail_flag:
-                self.state = JiraStates.Idle(self)
+                self.state = JiraStates.get_state(self, "Idle")
                 self.state.stop(self)
 
+            # The task is kept even when the phase could not be restored
+            if type(status.get("task")) == str:
+                self.task = status["task"]
+
+    def get_snapshot(self) -> dict:
+        status = {
+            "time_end": self.time_end,
+            "time_start": self.time_start,
+            "iteration": self.iteration,
+            "task": self.task,
+            "state": {
+                "name": str(self.state),
+                "properties": self.state.get_properties()
+            }
+        }
+
+        return status
+
     def write_status(self):
+        # Only called on real transitions. The snapshot is taken now and
+        # written to the state file later by the store's writer thread.
         try:
-            with open(f"/tmp/tmux-pytimer/{self.name}.json", "w+") as f:
-                status = {
-                    "time_end": self.time_end,
-                    "time_start": self.time_start,
-                    "iteration": self.iteration,
-                    "state": {
-                        "name": str(self.state),
-                        "properties": self.state.get_properties()
-                    }
-                }
-
-                json.dump(status, f, indent=2)
+            status = self.get_snapshot()
         except Exception as e:
-            raise Exception(f"Unable to write {self.name} status file")
-
-    def sanitize_tickets(self, tickets) -> list[dict]:
-        for ticket in tickets:
-            ticket[JiraFields.SUMMARY] = ticket["fields"][JiraFields.SUMMARY]
-            ticket.pop("expand")
-            ticket.pop("fields")
+            raise Exception(f"Unable to snapshot {self.name} status")
 
-        return tickets
+        Persistence.store.schedule(self.name, status)
 
+    @classmethod
+    def tickets_query(cls) -> str:
+        if cls.TICKETS_QUERY == None:
+            from jira_lib import JiraFields
 
-    def gen_tickets_menu(self):
-        tickets = self.jira.get_tickets(f"{JiraFields.ASSIGNEE} = 'M83393' " \
+            cls.TICKETS_QUERY = f"{JiraFields.ASSIGNEE} = 'M83393' " \
                 f"and {JiraFields.STATUS} != 'Done' " \
                 f"and {JiraFields.PROJECT} = 'MDT' "\
-                f"and {JiraFields.SPRINT} in openSprints()", 
-                fields=[JiraFields.SUMMARY])
-        tickets = self.sanitize_tickets(tickets)
+                f"and {JiraFields.SPRINT} in openSprints()"
+
+        return cls.TICKETS_QUERY
+
+    def gen_tickets_menu(self):
+        tickets = self.tickets.get()
 
         options = []
         for ticket in tickets:
@@ -227,17 +278,43 @@ class JiraTimer:
 
 
     def update(self) -> str:
-        self.read_status()
-
+        # The in-memory timer is the source of truth. Status is computed from
+        # it and the status file is only rewritten when a phase rolls over.
         now = int(datetime.now().strftime("%s"))
         self.task_time = now - self.time_start
 
-        if now >= self.time_end and str(self.state) in ["Working", "BreakLong", "BreakShort"]:
+        if self.is_due(now):
             self.log_work()
             self.state.next(self)
-        else:
-            self.state.update(self)
 
-        self.write_status()
+            self.write_status()
+
+        return self.render()
+
+    def render(self) -> str:
+        # Read only, phase rollovers are fired by the daemon's scheduler
+        self.state.update(self)
 
         return f"{self.state.status} "
+
+
+def sanitize_tickets(tickets) -> list[dict]:
+    from jira_lib import JiraFields
+
+    for ticket in tickets:
+        ticket[JiraFields.SUMMARY] = ticket["fields"][JiraFields.SUMMARY]
+        ticket.pop("expand")
+        ticket.pop("fields")
+
+    return tickets
+
+
+# Not a method, a shared ticket cache must not hold on to the timer that
+# happened to create it
+def fetch_tickets(verify_tls) -> list[dict]:
+    from jira_lib import JiraFields
+
+    jira = JiraClient.get_client(verify_tls=verify_tls)
+    tickets = jira.get_tickets(JiraTimer.tickets_query(), fields=[JiraFields.SUMMARY])
+
+    return sanitize_tickets(tickets)
@@ -1,6 +1,6 @@
 import json
 from .Timer import TimerInterface
-from .. import TmuxHelper
+from .. import TmuxHelper, Runtime
 
 class PomodoroTimer(TimerInterface):
     def __init__(self, name="Pomodoro", priority=0, start_complete=False, time_work=60, 
@@ -117,7 +117,7 @@ class PomodoroTimer(TimerInterface):
     
     def read_status(self):
         try:
-            with open(f"/tmp/tmux-pytimer/{self.name}.json", "r") as f:
+            with open(f"{Runtime.RUNTIME_DIR}/{self.name}.json", "r") as f:
                 status = json.load(f)
         except:
             raise Exception(f"Unable to access {self.name} status file")
@@ -131,7 +131,7 @@ class PomodoroTimer(TimerInterface):
 
     def write_status(self):
         try:
-            with open(f"/tmp/tmux-pytimer/{self.name}.json", "w+") as f:
+            with open(f"{Runtime.RUNTIME_DIR}/{self.name}.json", "w+") as f:
                 status = {
                     "time_start": self.time_start,
                     "time_left": self.time_left,
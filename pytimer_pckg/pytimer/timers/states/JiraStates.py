@@ -3,13 +3,16 @@ import math
 import logging
 from datetime import datetime
 import os
-from ... import TmuxHelper
+from ... import TmuxHelper, Effects
 
+# States are created once per timer by get_state() and reused on every
+# transition, so the menus below are only built once per timer.
 class JiraState:
+    __slots__ = ("status", "menu_base_options")
+    enabled = False
+
     def __init__(self):
         self.status = ""
-        self.status_base = ""
-        self.enabled = False
         self.menu_base_options = []
 
     def state_init(self):
@@ -22,9 +25,12 @@ class JiraState:
         raise NotImplementedError
 
     def pause(self, timer):
-        logging.debug(f"pause restore: {self}")
+        logging.debug("pause restore: %s", self)
+
+        state = get_state(timer, "Paused")
+        state.hold(timer)
 
-        return Paused(timer)
+        return state
 
     def stop(self, timer):
         timer.time_start = 0
@@ -33,7 +39,7 @@ class JiraState:
         timer.task = None
         timer.task_time = 0
 
-        return Idle(timer)
+        return get_state(timer, "Idle")
 
     def update_status(self, timer):
         pass
@@ -44,47 +50,46 @@ class JiraState:
     def restore_properties(self, timer, properties: dict):
         pass
 
-    def update(self, timer):
-        self.menu_options = self.menu_base_options
-        if timer.task != None:
-            self.menu_options = [TmuxHelper.menu_add_option("", "", ""), TmuxHelper.menu_add_option(f"-#[nodim]{timer.task}", "", ""), TmuxHelper.menu_add_option("", "", "")] + self.menu_options
+    def get_menu_options(self, timer):
+        if timer.task == None:
+            return self.menu_base_options
+
+        return [TmuxHelper.menu_add_option("", "", ""), TmuxHelper.menu_add_option(f"-#[nodim]{timer.task}", "", ""), TmuxHelper.menu_add_option("", "", "")] + self.menu_base_options
 
+    def update(self, timer):
         self.update_status(timer)
 
 class Idle(JiraState):
+    __slots__ = ()
     STATUS_ICON = ""
     STATUS_STYLE = "#[fg=#282828]#[bg=#427b58]#[bold]"
 
     def __init__(self, timer):
         self.state_init()
         self.status = ""
-        self.enabled = False
-        self.menu_options = []
         self.menu_base_options = [
             TmuxHelper.menu_add_option("Start", "t", f"run-shell \"{TmuxHelper.get_plugin_dir()}/scripts/tmux_pytimer.py START --blocking --timer {timer.name}\""),
             TmuxHelper.menu_add_option("", "", ""),
             TmuxHelper.menu_add_option("Set Task", "", f"run-shell \"{TmuxHelper.get_plugin_dir()}/scripts/tmux_pytimer.py TASKS --blocking --timer {timer.name}\""),
         ]
 
-        self.update(timer)
-
     def next(self, timer):
         now = int(datetime.now().strftime("%s")) 
         timer.time_end = now + timer.time_work
         timer.time_start = now
 
-        timer.state = Working(timer)
+        timer.state = get_state(timer, "Working")
 
         
 class Working(JiraState):
+    __slots__ = ()
+    enabled = True
     STATUS_ICON = ""
     STATUS_STYLE = "#[fg=#282828]#[bg=#427b58]#[bold]"
 
     def __init__(self, timer):
         self.state_init()
         self.status = ""
-        self.enabled = True
-        self.menu_options = []
         self.menu_base_options = [
             TmuxHelper.menu_add_option("Pause", "t", f"run-shell \"{TmuxHelper.get_plugin_dir()}/scripts/tmux_pytimer.py PAUSE --timer {timer.name}\""),
             TmuxHelper.menu_add_option("Stop", "x", f"run-shell \"{TmuxHelper.get_plugin_dir()}/scripts/tmux_pytimer.py STOP --timer {timer.name}\""),
@@ -92,8 +97,6 @@ class Working(JiraState):
             TmuxHelper.menu_add_option("Set Task", "", f"run-shell \"{TmuxHelper.get_plugin_dir()}/scripts/tmux_pytimer.py TASKS --blocking --timer {timer.name}\"")
         ]
 
-        self.update(timer)
-
     def next(self, timer):
         timer.iteration += 1
         now = int(datetime.now().strftime("%s")) 
@@ -101,14 +104,17 @@ class Working(JiraState):
         if timer.iteration > timer.sessions:
             timer.iteration = 1
             time_end = now + timer.time_break_long
-            timer.state = BreakLong(timer)
-            TmuxHelper.popup_create(timer.name, "Session finished, take a long break")
+            timer.state = get_state(timer, "BreakLong")
+            Effects.effects.enqueue(TmuxHelper.popup_create, timer.name, "Session finished, take a long break")
         else:
             time_end = now + timer.time_break_short
-            timer.state = BreakShort(timer)
-            TmuxHelper.popup_create(timer.name, "Session finished, take a short break")
+            timer.state = get_state(timer, "BreakShort")
+            Effects.effects.enqueue(TmuxHelper.popup_create, timer.name, "Session finished, take a short break")
 
-        TmuxHelper.popup_create(f"Add comment for {timer.task}", f"{TmuxHelper.get_plugin_dir()}/scripts/add_comment.py {timer.task} \"$response\"", height=30, input=True)
+        # The task is captured now, the popup is answered after the session
+        # popup and the timer's task may have changed or been cleared by then
+        if timer.task != None:
+            Effects.effects.enqueue_detached(TmuxHelper.popup_create, f"Add comment for {timer.task}", f"{TmuxHelper.get_plugin_dir()}/scripts/tmux_pytimer.py COMMENT --timer {timer.name} --task {timer.task} --value \"$response\"", height=30, input=True)
 
         timer.time_start = now
         timer.time_end = time_end
@@ -119,14 +125,14 @@ class Working(JiraState):
         self.status = f"{self.STATUS_STYLE} {self.STATUS_ICON} {timer.iteration}/{timer.sessions} {time_left}"
 
 class BreakLong(JiraState):
+    __slots__ = ()
+    enabled = True
     STATUS_ICON = ""
     STATUS_STYLE = "#[fg=#282828]#[bg=#427b58]#[bold]"
 
     def __init__(self, timer):
         self.state_init()
         self.status = ""
-        self.enabled = True
-        self.menu_options = []
         self.menu_base_options = [
             TmuxHelper.menu_add_option("Pause", "t", f"run-shell \"{TmuxHelper.get_plugin_dir()}/scripts/tmux_pytimer.py PAUSE --timer {timer.name}\""),
             TmuxHelper.menu_add_option("Stop", "x", f"run-shell \"{TmuxHelper.get_plugin_dir()}/scripts/tmux_pytimer.py STOP --timer {timer.name}\""),
@@ -134,16 +140,13 @@ class BreakLong(JiraState):
             TmuxHelper.menu_add_option("Set Task", "", f"run-shell \"{TmuxHelper.get_plugin_dir()}/scripts/tmux_pytimer.py TASKS --blocking --timer {timer.name}\""),
         ]
 
-        self.update(timer)
-
-
     def next(self, timer):
         now = int(datetime.now().strftime("%s")) 
         timer.time_end = now + timer.time_work
         timer.time_start = now
 
-        timer.state = Working(timer)
-        TmuxHelper.popup_create(timer.name, "Break finished, get back to work")
+        timer.state = get_state(timer, "Working")
+        Effects.effects.enqueue(TmuxHelper.popup_create, timer.name, "Break finished, get back to work")
 
 
     def update_status(self, timer):
@@ -153,14 +156,14 @@ class BreakLong(JiraState):
 
 
 class BreakShort(JiraState):
+    __slots__ = ()
+    enabled = True
     STATUS_ICON = ""
     STATUS_STYLE = "#[fg=#282828]#[bg=#427b58]#[bold]"
 
     def __init__(self, timer):
         self.state_init()
         self.status = ""
-        self.enabled = True
-        self.menu_options = []
         self.menu_base_options = [
             TmuxHelper.menu_add_option("Pause", "t", f"run-shell \"{TmuxHelper.get_plugin_dir()}/scripts/tmux_pytimer.py PAUSE --timer {timer.name}\""),
             TmuxHelper.menu_add_option("Stop", "x", f"run-shell \"{TmuxHelper.get_plugin_dir()}/scripts/tmux_pytimer.py STOP --timer {timer.name}\""),
@@ -168,16 +171,13 @@ class BreakShort(JiraState):
             TmuxHelper.menu_add_option("Set Task", "", f"run-shell \"{TmuxHelper.get_plugin_dir()}/scripts/tmux_pytimer.py TASKS --blocking --timer {timer.name}\"")
         ]
 
-        self.update(timer)
-
-
     def next(self, timer):
         now = int(datetime.now().strftime("%s")) 
         timer.time_end = now + timer.time_work
         timer.time_start = now
 
-        timer.state = Working(timer)
-        TmuxHelper.popup_create(timer.name, "Break finished, get back to work")
+        timer.state = get_state(timer, "Working")
+        Effects.effects.enqueue(TmuxHelper.popup_create, timer.name, "Break finished, get back to work")
 
     
     def update_status(self, timer):
@@ -186,16 +186,16 @@ class BreakShort(JiraState):
         self.status = f"{self.STATUS_STYLE} {self.STATUS_ICON} {timer.iteration}/{timer.sessions} {time_left}"
 
 class Paused(JiraState):
+    __slots__ = ("restore_state", "restore_time")
+    enabled = True
     STATUS_ICON = ""
     STATUS_STYLE = "#[fg=#282828]#[bg=#d65d0e]#[bold]"
 
     def __init__(self, timer):
         self.state_init()
         self.restore_state = timer.state
-        self.restore_time = timer.time_end - int(datetime.now().strftime("%s"))
+        self.restore_time = 0
         self.status = ""
-        self.enabled = True
-        self.menu_options = []
         self.menu_base_options = [
             TmuxHelper.menu_add_option("Resume", "t", f"run-shell \"{TmuxHelper.get_plugin_dir()}/scripts/tmux_pytimer.py RESUME --timer {timer.name}\""),
             TmuxHelper.menu_add_option("Stop", "x", f"run-shell \"{TmuxHelper.get_plugin_dir()}/scripts/tmux_pytimer.py STOP --timer {timer.name}\""),
@@ -203,8 +203,13 @@ class Paused(JiraState):
             TmuxHelper.menu_add_option("Set Task", "", f"run-shell \"{TmuxHelper.get_plugin_dir()}/scripts/tmux_pytimer.py TASKS --blocking --timer {timer.name}\"")
         ]
 
-        self.update(timer)
+    def hold(self, timer):
+        self.restore_state = timer.state
+        self.restore_time = timer.time_end - int(datetime.now().strftime("%s"))
 
+    def pause(self, timer):
+        # Already paused. Holding again would make Paused restore to itself.
+        return self
 
     def next(self, timer):
         now = int(datetime.now().strftime("%s")) 
@@ -224,7 +229,7 @@ class Paused(JiraState):
         if properties == None:
             raise Exception(f"{self} requires properties to be specified when restoring")
 
-        if properties["restore_state"] not in list(STATES.keys()):
+        if properties["restore_state"] not in list(STATES.keys()) or properties["restore_state"] == "Paused":
             raise Exception(f"{properties['restore_state']} is not a valid restore state")
 
         if type(properties["restore_time"]) != int:
@@ -233,11 +238,7 @@ class Paused(JiraState):
         if properties["restore_time"] < 0:
             raise Exception(f"{properties['restore_time']} can not be negative")
 
-        state = STATES[properties["restore_state"]](timer)
-        if str(state) != str(self.restore_state):
-            self.restore_state = state
-        else:
-            del state
+        self.restore_state = get_state(timer, properties["restore_state"])
         self.restore_time = properties["restore_time"]
 
     def update_status(self, timer):
@@ -252,3 +253,12 @@ STATES = {
     "BreakLong": BreakLong,
     "Paused": Paused
 }
+
+
+def get_state(timer, name):
+    state = timer.states.get(name)
+    if state == None:
+        state = STATES[name](timer)
+        timer.states[name] = state
+
+    return state
@@ -22,7 +22,12 @@ set_tmux_option() {
 interpolate_status() {
     local status
     local interpolated_status="\#{pytimer_status}"
-    local status_line="#($CURRENT_DIR/scripts/tmux_pytimer.py STATUS)"
+    local status_line="#($CURRENT_DIR/scripts/pytimer_status.py)"
+
+    # In push mode the daemon keeps @pytimer_status up to date itself
+    if [[ "$(get_tmux_option "@pytimer_push" "off")" == "on" ]]; then
+        status_line="#{@pytimer_status}"
+    fi
     echo "$status_line"
 
     status=$(get_tmux_option "status-right" "-1")
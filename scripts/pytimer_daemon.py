@@ -1,49 +1,108 @@
 #!/home/m83393/.tmux/tmux-venv/bin/python3
 
 import os
+import time
+import queue
 import socket
 import signal
+import asyncio
 import logging
 import datetime
+import threading
 import traceback
-from pytimer import TmuxHelper
-from pytimer.timers import JiraTimer
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from concurrent.futures import ThreadPoolExecutor
+from pytimer import TmuxHelper, Persistence, Effects, CommentQueue, WorklogQueue, Protocol, Config, StatusSegment, Runtime
+from pytimer.Metrics import metrics
+from pytimer.StatusCache import StatusCache
+from pytimer.StatusPublisher import StatusPublisher
+from pytimer.Scheduler import DeadlineScheduler
+from pytimer.TimerIndex import TimerIndex
+
+# Records are queued by the logging threads and written by one listener
+# thread, so logging never puts file I/O on the request path
+log_queue = queue.SimpleQueue()
+log_handler = None
+log_listener = None
 
 class PyTimerDaemon:
-    CMDS = ["LIST", "STATUS"]
-    PATH = "/tmp/tmux-pytimer/daemon"
+    CMDS = ["LIST", "STATUS", "RESIZE", "ADD", "REMOVE", "RELOAD", "METRICS"]
+    PATH = Runtime.DAEMON_DIR
+    BACKLOG = 128
+    WORKERS = 4
+    LOG_MAX_BYTES = 1024 * 1024
+    LOG_BACKUPS = 3
 
     def __init__(self):
-        self.init_logging(log_level=logging.DEBUG)
+        # Set with `set -g @pytimer_log_level debug` in tmux.conf
+        self.init_logging(log_level=TmuxHelper.get_option("@pytimer_log_level", "info"))
 
         if os.path.exists(f"{self.PATH}/pytimer.sock"):
             self.check_sock_alive(f"{self.PATH}/pytimer.sock")
         else:
             os.makedirs(self.PATH, exist_ok=True)
 
-        # Define timers
-        #pomodoro = PomodoroTimer()
-        jira = JiraTimer(verify_tls=False)
-        jira2 = JiraTimer(priority=100, name="Test", sessions=1, verify_tls=False)
+        # Bound before anything slow runs, so status line requests made while
+        # the daemon starts wait in the backlog instead of failing
+        self.server = self.bind(f"{self.PATH}/pytimer.sock")
 
-        self.timers = {
-            jira.name: jira,
-            jira2.name: jira2
-        }
+        TmuxHelper.resolve_environment()
 
+        self.timers = TimerIndex()
+        # Specs of the timers that came from the config file. Timers added
+        # with ADD are not in here and survive a RELOAD.
+        self.config_specs = {}
 
-    def init_logging(self, log_level=logging.INFO):
-        if os.path.exists("/tmp/tmux-pytimer/daemon/") != True:
-            os.makedirs("/tmp/tmux-pytimer/daemon/")
+        self.status_cache = StatusCache()
+        self.scheduler = DeadlineScheduler(self.fire_deadline)
+
+        self.config_path = TmuxHelper.get_option("@pytimer_config", f"{TmuxHelper.get_plugin_dir()}/timers.toml")
+        try:
+            self.reload_config()
+        except Exception as e:
+            # Start without timers rather than die after binding the socket.
+            # Nothing is written to the state file, so a RELOAD once the
+            # config is fixed still restores every timer.
+            logging.error(f"[{e.__class__.__name__}] Unable to load {self.config_path}, starting without timers: {e}")
+            TmuxHelper.message_create(f"pytimer: unable to load {self.config_path}, see {Runtime.LOG_PATH}")
+
+        # Serializes access to the timers between the request loop, the
+        # worker threads and the status publisher
+        self.lock = threading.RLock()
+        self.last_status = Protocol.encode_values([""])
+        self.executor = None
+
+        # The status is always published to the shared status segment. Push
+        # mode is enabled with `set -g @pytimer_push on` in tmux.conf.
+        push = TmuxHelper.get_option("@pytimer_push", "off") == "on"
+        self.publisher = StatusPublisher(self.publish_status, self.status_deadlines, segment=StatusSegment.segment, push=push)
+
+
+    def init_logging(self, log_level="info"):
+        global log_handler
+
+        if os.path.exists(self.PATH) != True:
+            os.makedirs(self.PATH)
+
+        level = logging.getLevelName(log_level.upper())
+        valid_level = type(level) == int
+        if not valid_level:
+            level = logging.INFO
 
         logFormatter = logging.Formatter("[%(levelname)-8s]\t%(message)s")
 
         rootLogger = logging.getLogger()
-        rootLogger.setLevel(log_level)
+        rootLogger.setLevel(level)
 
-        fileHandler = logging.FileHandler(f"/tmp/tmux-pytimer/daemon/daemon.log")
-        fileHandler.setFormatter(logFormatter)
-        rootLogger.addHandler(fileHandler)
+        # The file is only written by the listener thread, callers just queue
+        # the record
+        log_handler = RotatingFileHandler(Runtime.LOG_PATH, maxBytes=self.LOG_MAX_BYTES, backupCount=self.LOG_BACKUPS)
+        log_handler.setFormatter(logFormatter)
+        rootLogger.addHandler(QueueHandler(log_queue))
+        start_log_listener()
+
+        if not valid_level:
+            logging.warning(f"{log_level} is not a valid log level, using info")
 
         logging.info(f"Logging started {datetime.datetime.now()}")
 
@@ -59,187 +118,512 @@ class PyTimerDaemon:
             return
 
         logging.warning("Daemon already running. Aborting duplicate startup")
+        stop_log_listener()
         os._exit(0)
 
 
-    def handle_daemon_command(self, cmd) -> list:
-        response = ["ACK"]
+    def bind(self, socket_path) -> socket.socket:
+        try:
+            os.unlink(socket_path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logging.critical("Unable to remove old socket")
+            stop_log_listener()
+            os._exit(0)
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        server.bind(socket_path)
+        server.listen(self.BACKLOG)
+        logging.info(f"Daemon listening on {socket_path}")
+
+        return server
+
+
+    def encode_response(self, req_id, response) -> bytes:
+        # Handlers return a list of values or an already encoded body
+        if type(response) != bytes:
+            response = Protocol.encode_values(response)
+
+        return Protocol.encode_frame(Protocol.ACK, req_id, response)
+
+
+    def handle_daemon_command(self, cmd):
+        response = []
         logging.info(f"Received daemon command: {cmd['action']}")
 
         if cmd["action"] == "LIST":
             self.daemon_list()
         elif cmd["action"] == "STATUS":
-            response.insert(0, self.daemon_status())
+            # Already encoded
+            return self.daemon_status()
+        elif cmd["action"] == "RESIZE":
+            # Popups ask for their client's size, only kept so client-resized
+            # hooks set by older versions do not fail
+            pass
+        elif cmd["action"] == "ADD":
+            if cmd["value"] == None:
+                raise Exception("ADD requires a timer spec, e.g. { name = \"Pairing\", priority = 10 }")
+
+            spec = Config.parse_spec(cmd["value"])
+            if spec["name"] in self.timers:
+                raise Exception(f"A timer named {spec['name']} already exists")
+
+            self.add_timer(spec)
+            response = [f"Added {spec['name']}"]
+        elif cmd["action"] == "REMOVE":
+            if cmd["value"] in self.timers:
+                self.remove_timer(cmd["value"])
+                response = [f"Removed {cmd['value']}"]
+            # Also forgets the saved state of a timer that is not loaded
+            elif Persistence.store.remove(cmd["value"]):
+                response = [f"Removed the saved state of {cmd['value']}"]
+            else:
+                raise Exception(f"There is no timer named {cmd['value']}")
+        elif cmd["action"] == "RELOAD":
+            response = self.reload_config()
+        elif cmd["action"] == "METRICS":
+            # Optionally also written to a file for a Prometheus textfile collector
+            if cmd["value"] != None:
+                metrics.dump(cmd["value"])
+
+            response = [metrics.render()]
         else:
             logging.warning(f"{cmd['action']} is a valid daemon command, but it is not implemented")
 
         return response
 
 
-    def daemon_status(self):
+    def add_timer(self, spec, snapshot=None):
+        timer = Config.create_timer(spec)
+
+        # Pick up where the previous run, or the timer being replaced, left off
+        if snapshot == None:
+            snapshot = Persistence.store.restore(timer.name)
+
+        if snapshot != None:
+            try:
+                timer.read_status(snapshot)
+                logging.info(f"Restored {timer.name} in {timer.state}")
+            except Exception as e:
+                logging.warning(f"[{e.__class__.__name__}] {e}, {timer.name} starts idle")
+
+            timer.write_status()
+
+        self.timers.add(timer)
+        self.scheduler.schedule(timer)
+        self.status_cache.invalidate()
+        logging.info(f"Added timer {timer.name}")
+
+        return timer
+
+
+    def remove_timer(self, name, log_work=True):
+        timer = self.timers.remove(name)
+        self.config_specs.pop(name, None)
+        self.scheduler.unschedule(name)
+        self.status_cache.invalidate()
+        Persistence.store.remove(name)
+
+        # Log the running session before the timer goes away, unless it is
+        # carried over to a rebuilt timer that logs it when the phase ends
+        if log_work:
+            timer.log_work()
+        logging.info(f"Removed timer {name}")
+
+        return timer
+
+
+    def reload_config(self) -> list:
+        if os.path.exists(self.config_path):
+            specs = Config.load(self.config_path)
+        else:
+            logging.warning(f"No config file at {self.config_path}, using the default timers")
+            specs = Config.DEFAULT_SPECS
+
+        old_specs = dict(self.config_specs)
+        replaced = {}
+
+        # Timers whose spec did not change are left alone. Changed timers are
+        # rebuilt from their current snapshot, the running session is logged
+        # by the rebuilt timer.
+        for name, spec in old_specs.items():
+            if specs.get(name) != spec:
+                timer = self.remove_timer(name, log_work=name not in specs)
+                if name in specs:
+                    replaced[name] = timer
+
+        for name, spec in specs.items():
+            if name in self.config_specs:
+                continue
+
+            # The config takes over a timer added at runtime with the same name
+            if name in self.timers:
+                self.remove_timer(name)
+
+            if name not in replaced:
+                self.add_timer(spec)
+            else:
+                snapshot = replaced[name].get_snapshot()
+                timer = self.add_timer(spec, snapshot=snapshot)
+
+                # The snapshot did not fit the new spec, so the rebuilt timer
+                # started idle and the old session has to be logged here
+                if str(timer.state) != snapshot["state"]["name"]:
+                    replaced[name].log_work()
+
+            self.config_specs[name] = spec
+
+        changes = [f"Removed {name}" for name in old_specs if name not in specs]
+        changes += [f"Updated {name}" for name in specs if name in old_specs and old_specs[name] != specs[name]]
+        changes += [f"Added {name}" for name in specs if name not in old_specs]
+        logging.info(f"Loaded {self.config_path}: {changes}")
+
+        return changes
+
+
+    def daemon_status(self) -> bytes:
+        now = time.time()
+        payload = self.status_cache.get(now)
+        if payload != None:
+            metrics.inc("pytimer_status_cache_total", result="hit")
+            return payload
+
+        metrics.inc("pytimer_status_cache_total", result="miss")
+
+        generation = self.status_cache.generation
+        now = int(now)
+        expires = None
+
+        # Already in priority order. Read only, phase rollovers are fired by
+        # the scheduler.
         status = ""
-        timers = list(self.timers.values())
-        timers = sorted(timers, key=lambda timer: timer.priority)
-        for timer in timers:
+        for timer in self.timers.values():
             if timer.state.enabled:
-                result = timer.update()
+                with metrics.time("pytimer_timer_update_seconds", timer=timer.name):
+                    result = timer.render()
                 if type(result) != str:
-                    logging.critical(f"update() for {timer.name} did not return a string")
+                    logging.critical(f"render() for {timer.name} did not return a string")
                     continue
 
                 status += result
 
-        logging.debug(f"Updating status: {status}")
-        return status
+                # The rendered status is good until the first timer changes
+                deadline = timer.next_deadline(now)
+                if deadline != None and (expires == None or deadline < expires):
+                    expires = deadline
+
+        logging.debug("Updating status: %s", status)
+        payload = Protocol.encode_values([status])
+        self.status_cache.put(generation, payload, expires)
+
+        return payload
+
+
+    def publish_status(self) -> str:
+        with self.lock:
+            payload = self.daemon_status()
+
+        return payload.decode()
+
+
+    def status_deadlines(self) -> list:
+        now = int(datetime.datetime.now().strftime("%s"))
+        deadlines = []
+
+        with self.lock:
+            for timer in self.timers.values():
+                deadline = timer.next_deadline(now)
+                if deadline != None:
+                    deadlines.append(deadline)
+
+        return deadlines
+
+
+    def fire_deadline(self, name):
+        with self.lock:
+            timer = self.timers.get(name)
+            if timer == None:
+                return
+
+            now = int(datetime.datetime.now().strftime("%s"))
+            rolled_over = timer.is_due(now)
+            if rolled_over:
+                logging.debug("Deadline reached for %s", name)
+                with metrics.time("pytimer_timer_update_seconds", timer=name):
+                    timer.update()
+                self.status_cache.invalidate()
+
+            self.scheduler.schedule(timer)
+
+        if not rolled_over:
+            return
+
+        # In push mode publishing the new status already redraws tmux, only
+        # status lines polling #(pytimer_status.py) need the refresh
+        self.publisher.wake()
+        if not self.publisher.push:
+            TmuxHelper.refresh()
 
 
     def daemon_list(self):
         options = []
-        for timer in list(self.timers.values()):
+        for timer in self.timers.values():
             if timer.state.enabled:
                 options.append(TmuxHelper.menu_add_option(f"* {timer.name}", "", f"run-shell \"{TmuxHelper.get_plugin_dir()}/scripts/tmux_pytimer.py MENU --timer {timer.name} --blocking\""))
             else:
                 options.append(TmuxHelper.menu_add_option(f"  {timer.name}", "", f"run-shell \"{TmuxHelper.get_plugin_dir()}/scripts/tmux_pytimer.py MENU --timer {timer.name} --blocking\""))
 
-        TmuxHelper.menu_create("Timers", "R", "S", options)
+        Effects.effects.spawn(TmuxHelper.menu_create, "Timers", "R", "S", options)
 
         return
 
 
     def daemon_stop(self):
         logging.info(f"Received STOP command. Quiting...")
+        Persistence.store.flush()
+        StatusSegment.segment.close()
         os.unlink(f"{self.PATH}/pytimer.sock")
         logging.info(f"Logging ended {datetime.datetime.now()}")
+        stop_log_listener()
         os._exit(0)
 
 
     def handle_timer_command(self, cmd) -> list:
-        response = ["ACK"]
+        response = []
         logging.info(f"Received timer command: {cmd['action']} for {cmd['timer']}")
+        timer = self.timers[cmd['timer']]
 
         if cmd["action"] == "MENU":
-            self.timers[cmd['timer']].gen_menu()
+            timer.gen_menu()
         elif cmd["action"] == "TASKS":
-            self.timers[cmd['timer']].gen_tickets_menu()
+            Effects.effects.spawn(timer.gen_tickets_menu)
         elif cmd["action"] == "START":
-            self.timers[cmd['timer']].start()
+            timer.start()
         elif cmd["action"] == "STOP":
-            self.timers[cmd['timer']].stop()
+            timer.stop()
         elif cmd["action"] == "PAUSE":
-            self.timers[cmd['timer']].pause()
+            timer.pause()
         elif cmd["action"] == "RESUME":
-            self.timers[cmd['timer']].resume()
+            timer.resume()
         elif cmd["action"] == "SET":
-            self.timers[cmd['timer']].set_task(cmd['value'])
+            timer.set_task(cmd['value'])
         elif cmd["action"] == "COMMENT":
-            self.timers[cmd['timer']].comment(cmd['value'])
+            # Comment popups send the task they were raised for ahead of the
+            # comment, the timer's task may have changed since
+            value = cmd.get('value')
+            if value != None and Protocol.SEP in value:
+                task, comment = value.split(Protocol.SEP, 1)
+                timer.comment(comment, task=task)
+            else:
+                timer.comment(value)
         else:
             logging.warning(f"{cmd['action']} is a valid daemon command, but it is not implemented")
 
+        # Any timer command may have changed what the status line shows
+        self.status_cache.invalidate()
+
         return response
 
 
-    def validate_command(self, data):
+    def validate_command(self, body, flags):
         try:
-            data = data.decode()
+            request = Protocol.decode_request(body)
         except Exception as e:
             logging.warning(f"[{e.__class__.__name__}] Unable to decode message")
             return None
 
         try:
-            logging.debug(f"Received: {data}")
-            data = data.split(" ")
-            if "BLOCK" in data:
-                data.remove("BLOCK")
-                block = True
-            else:
-                block = False
-
-            timer_names = list(self.timers.keys())
+            logging.debug("Received: %s", request)
+            block = flags & Protocol.FLAG_BLOCK != 0
+            cmd = request["cmd"]
+            value = request["value"]
 
-            if len(data) > 3:
-                logging.warning(f"{len(data)} arguments provided.\nDaemon commands require one positional argument ([CMD]) and Timer commands require two positional arguments ([CMD] [TIMER]).\n{data}")
-                return None
             # Daemon Command
-            elif len(data) == 1:
-                cmd = data[0]
+            if request["timer"] == None:
                 if cmd not in self.CMDS:
                     logging.warning(f"{cmd} is not a valid daemon command. Valid daemon commands are: {self.CMDS}")
                     return None
 
-                return {"type": "daemon", "cmd": {"action": cmd, "blocking": block}}
+                return {"type": "daemon", "cmd": {"action": cmd, "value": value, "blocking": block}}
             # Timer Command
-            elif len(data) >= 2:
-                cmd = data[0]
-                timer_name = data[1]
-                if len(data) == 3:
-                    value = data[2]
-                else:
-                    value = None
+            else:
+                timer_name = request["timer"]
+                timer = self.timers.get(timer_name)
+
+                if timer == None:
+                    logging.warning(f"There is no timer named {timer_name}. Valid timers are: {self.timers.keys()}")
+                    return None
 
-                if timer_name not in timer_names:
-                    logging.warning(f"There is no timer named {timer_name}. Valid timers are: {timer_names}")
+                if cmd not in timer.cmds:
+                    logging.warning(f"{cmd} is not a valid command for {timer.name}. Valid commands for {timer.name} are: {timer.cmds}")
                     return None
 
-                for timer in list(self.timers.values()):
-                    if timer.name == timer_name:
-                        if cmd not in timer.cmds:
-                            logging.warning(f"{cmd} is not a valid command for {timer.name}. Valid commands for {timer.name} are: {timer.cmds}")
-                        else:
-                            if len(data) == 2:
-                                return {"type": "timer", "cmd": {"action": cmd, "timer": timer_name, "blocking": block}}
-                            elif value != None:
-                                return {"type": "timer", "cmd": {"action": cmd, "timer": timer_name, "value": value, "blocking": block}}
-
-                return None
+                if value == None:
+                    return {"type": "timer", "cmd": {"action": cmd, "timer": timer_name, "blocking": block}}
+                else:
+                    return {"type": "timer", "cmd": {"action": cmd, "timer": timer_name, "value": value, "blocking": block}}
         except Exception as e:
             logging.warning(f"[{e.__class__.__name__}] Unable to decode message")
 
 
-    def listen(self, server):
-        connection, client_address = server.accept()
+    def status_nowait(self) -> bytes:
+        # STATUS is answered on the event loop. If a worker is holding the
+        # timers, serve the last rendered status instead of waiting for it.
+        if self.lock.acquire(blocking=False):
+            try:
+                self.last_status = self.daemon_status()
+            finally:
+                self.lock.release()
+
+        return self.last_status
+
 
+    def handle_command(self, command):
+        with self.lock:
+            if command["type"] == "daemon":
+                response = self.handle_daemon_command(command["cmd"])
+            elif command["type"] == "timer":
+                response = self.handle_timer_command(command["cmd"])
+                self.scheduler.schedule(self.timers[command["cmd"]["timer"]])
+            else:
+                response = []
+                logging.warning(f"Unknown command type {command['type']}.\n{command}")
+
+        changed = command["type"] == "timer" or command["cmd"]["action"] in ["ADD", "REMOVE", "RELOAD"]
+        if changed:
+            self.publisher.wake()
+
+        # Timer commands refresh tmux themselves
+        if command["type"] == "daemon" and changed:
+            TmuxHelper.refresh()
+
+        return response
+
+
+    async def respond(self, writer, req_id, command, start):
+        loop = asyncio.get_running_loop()
+        action = command["cmd"]["action"]
+
+        if command["type"] == "daemon" and command["cmd"]["action"] == "STATUS":
+            response = self.status_nowait()
+        else:
+            # Jira queries and tmux subprocesses block, keep them off the loop
+            try:
+                response = await loop.run_in_executor(self.executor, self.handle_command, command)
+            except Exception as e:
+                logging.error(f"[{e.__class__.__name__}] {action} failed: {e}")
+                metrics.inc("pytimer_request_errors_total", cmd=action)
+                writer.write(Protocol.encode_frame(Protocol.ERROR, req_id, str(e).encode()))
+                await writer.drain()
+                return
+
+        # Each frame goes out in a single write, so replies never interleave
+        response = self.encode_response(req_id, response)
         try:
-            logging.debug(f"Connection from {str(connection).split(', ')[0][-4:]}")
+            writer.write(response)
+            await writer.drain()
+        except ConnectionError:
+            logging.warning(f"Client went away before the reply to request {req_id}")
+            return
+
+        metrics.inc("pytimer_bytes_sent_total", len(response))
+        metrics.observe("pytimer_command_seconds", time.perf_counter() - start, cmd=action)
+        logging.debug("Sent: %s", response)
 
+
+    async def listen(self, reader, writer):
+        tasks = set()
+
+        try:
+            logging.debug("Connection from %s", writer.get_extra_info('socket').fileno())
+
+            # Requests on one connection are handled concurrently and answered
+            # as they complete, matched up by their request id
             while True:
-                data = connection.recv(1024)
-                if not data:
+                try:
+                    header = await reader.readexactly(Protocol.HEADER.size)
+                    length, req_id, frame_type, flags = Protocol.HEADER.unpack(header)
+                    body = await reader.readexactly(length)
+                except (asyncio.IncompleteReadError, ConnectionError):
                     break
 
-                command = self.validate_command(data)
-                if command == None:
-                    break
+                start = time.perf_counter()
+                metrics.inc("pytimer_bytes_received_total", Protocol.HEADER.size + length)
 
-                if command["cmd"]["blocking"]:
-                    message = f"SYN ACK;"
-                    connection.sendall(message.encode())
-                    logging.debug(f"Sent: {message}")
-
-                if command["type"] == "daemon":
-                    response = self.handle_daemon_command(command["cmd"])
-                elif command["type"] == "timer":
-                    response = self.handle_timer_command(command["cmd"])
-                else:
-                    response = ["ACK"]
-                    logging.warning(f"Unknown command type {command['type']}.\n{command}")
+                command = None
+                if frame_type == Protocol.REQUEST:
+                    command = self.validate_command(body, flags)
 
-                for msg in response:
-                    msg += ";"
-                    connection.sendall(msg.encode())
-                    logging.debug(f"Sent: {msg[:-1]}")
+                if command == None:
+                    metrics.inc("pytimer_request_errors_total", cmd="invalid")
+                    writer.write(Protocol.encode_frame(Protocol.ERROR, req_id, b"Invalid command, see the daemon log"))
+                    await writer.drain()
+                    continue
 
-            connection.close()
+                if command["cmd"]["blocking"]:
+                    writer.write(Protocol.encode_frame(Protocol.SYN_ACK, req_id))
+                    logging.debug("Sent: SYN ACK")
+
+                task = asyncio.create_task(self.respond(writer, req_id, command, start))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            # The client may half close after sending, finish what it asked for
+            if len(tasks) > 0:
+                await asyncio.gather(*tasks)
+
+            writer.close()
+        except ConnectionError as e:
+            # Only this client is affected, e.g. it closed without reading
+            # its replies
+            logging.warning(f"[{e.__class__.__name__}] Client went away: {e}")
+            writer.close()
         except Exception:
             logging.critical(f"Encountered the folloing error when receiving data: {traceback.format_exc()}")
-            connection.close()
+            writer.close()
             self.daemon_stop()
 
 
+    async def serve(self, server):
+        self.executor = ThreadPoolExecutor(max_workers=self.WORKERS, thread_name_prefix="pytimer-worker")
+        server = await asyncio.start_unix_server(self.listen, sock=server)
+
+        # Jira is only touched once requests are being served. Warming the
+        # Set Task menu creates the client and fetches the tickets in the
+        # background before anyone opens it.
+        for timer in self.timers.values():
+            timer.tickets.prefetch()
+
+        async with server:
+            await server.serve_forever()
+
+
+def start_log_listener():
+    global log_listener
+
+    if log_listener == None:
+        log_listener = QueueListener(log_queue, log_handler, respect_handler_level=True)
+        log_listener.start()
+
+
+def stop_log_listener():
+    global log_listener
+
+    # Writes out everything still queued
+    if log_listener != None:
+        log_listener.stop()
+        log_listener = None
+
+
 def signal_handler(sig, frame):
     logging.info(f"Received {signal.Signals(sig).name}. Quiting...")
-    os.unlink("/tmp/tmux-pytimer/daemon/pytimer.sock")
+    Persistence.store.flush()
+    StatusSegment.segment.close()
+    os.unlink(Runtime.SOCKET_PATH)
     logging.info(f"Logging ended {datetime.datetime.now()}")
+    stop_log_listener()
     os._exit(0)
 
 
@@ -250,26 +634,33 @@ def main():
     for sig in catchable_sigs:
         signal.signal(sig, signal_handler)
 
-    try:
-        os.unlink(f"{daemon.PATH}/pytimer.sock")
-    except FileNotFoundError:
-        pass
-    except OSError:
-        logging.critical("Unable to remove old socket")
-        os._exit(0)
-
-    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-
-    server.bind(f"{daemon.PATH}/pytimer.sock")
-    server.listen(1)
-    logging.info(f"Daemon listening on {daemon.PATH}/pytimer.sock")
+    # No thread may be running across the fork, the child starts its own
+    stop_log_listener()
 
     if os.fork():
         # Tell the parent process to exit
         os._exit(0)
 
-    while True:
-        daemon.listen(server)
+    # Threads do not survive the fork, so the writer is started in the child
+    start_log_listener()
+    Persistence.store.start()
+    Effects.effects.start()
+    TmuxHelper.start_control()
+    CommentQueue.comments.start()
+    WorklogQueue.worklogs.start()
+
+    for timer in daemon.timers.values():
+        daemon.scheduler.schedule(timer)
+    daemon.scheduler.start()
+
+    try:
+        StatusSegment.segment.open()
+    except OSError as e:
+        logging.warning(f"[{e.__class__.__name__}] Unable to create the status segment, clients will use the socket")
+
+    daemon.publisher.start()
+
+    asyncio.run(daemon.serve(daemon.server))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,139 @@
+#!/home/m83393/.tmux/tmux-venv/bin/python3 -S
+
+# Minimal STATUS client for the tmux status line. This runs on every status
+# interval for every client, so it only imports mmap, socket and struct and
+# skips site (-S) and the pytimer package entirely. The status is read from
+# the daemon's shared status segment (see pytimer.StatusSegment) and only
+# asked for over the socket, with the frames from pytimer.Protocol, when the
+# segment is missing or stale. Failures print nothing rather than flashing a
+# tmux message on every refresh.
+#
+# When no daemon is listening one is started with pytimer.Autostart, the
+# same as tmux_pytimer.py does, so the first refresh after login still shows
+# the status. Only that path loads site and the pytimer package.
+
+import sys
+import mmap
+# Already loaded by the interpreter, unlike os
+import posix
+import socket
+import struct
+
+# As in pytimer.Runtime, posix.environ has bytes keys
+RUNTIME_DIR = posix.environ.get(b"PYTIMER_RUNTIME_DIR", b"/tmp/tmux-pytimer").decode()
+SOCKET_PATH = f"{RUNTIME_DIR}/daemon/pytimer.sock"
+HEADER = struct.Struct("!IHBB")
+REQUEST = 1
+ACK = 3
+
+SEGMENT_PATH = f"{RUNTIME_DIR}/status.shm"
+SEGMENT_HEADER = struct.Struct("=4sIII")
+SEGMENT_MAGIC = b"PYTS"
+
+def read_segment():
+    try:
+        with open(SEGMENT_PATH, "rb") as f:
+            segment = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    with segment:
+        for _ in range(3):
+            magic, sequence, pid, length = SEGMENT_HEADER.unpack_from(segment, 0)
+            if magic != SEGMENT_MAGIC or pid == 0:
+                return None
+
+            # Odd while the daemon is writing
+            if sequence % 2 == 1 or SEGMENT_HEADER.size + length > len(segment):
+                continue
+
+            data = segment[SEGMENT_HEADER.size:SEGMENT_HEADER.size + length]
+            if struct.unpack_from("=I", segment, 4)[0] != sequence:
+                continue
+
+            try:
+                posix.kill(pid, 0)
+            except ProcessLookupError:
+                return None
+            except PermissionError:
+                pass
+
+            return data.decode()
+
+    return None
+
+def recv_exactly(client, size):
+    data = b""
+    while len(data) < size:
+        chunk = client.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Daemon closed the connection")
+
+        data += chunk
+
+    return data
+
+def read_socket():
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(2)
+
+    try:
+        client.connect(SOCKET_PATH)
+
+        body = b"STATUS\0"
+        client.sendall(HEADER.pack(len(body), 0, REQUEST, 0) + body)
+
+        length, req_id, frame_type, flags = HEADER.unpack(recv_exactly(client, HEADER.size))
+        body = recv_exactly(client, length)
+    except OSError:
+        return None
+    finally:
+        client.close()
+
+    if frame_type != ACK:
+        return None
+
+    return body.decode().split("\0")[0]
+
+def daemon_alive():
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        client.connect(SOCKET_PATH)
+    except OSError:
+        return False
+    finally:
+        client.close()
+
+    return True
+
+def start_daemon():
+    # Only runs when there is no daemon. Autostart owns the lock file and the
+    # back off after a failed start, -S left site-packages off the path.
+    import site
+    site.main()
+
+    try:
+        from pytimer import Autostart
+    except ImportError:
+        return False
+
+    return Autostart.start_daemon()
+
+def main():
+    status = read_segment()
+    if status == None:
+        status = read_socket()
+
+    if status == None and not daemon_alive() and start_daemon():
+        status = read_socket()
+
+    if status == None:
+        return 1
+
+    sys.stdout.write(status + "\n")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,32 +4,41 @@ import sys
 import os
 import socket
 import argparse
-from pytimer import TmuxHelper, DaemonStates
-
-def send_daemon_cmd(args):
-    socket_path = "/tmp/tmux-pytimer/daemon/pytimer.sock"
-
-    if not os.path.exists(socket_path):
-        TmuxHelper.message_create(f"Socket does not exists at {socket_path}. Has the daemon started?")
-        return
+from pytimer import TmuxHelper, DaemonStates, Protocol, Autostart, Runtime
 
+def connect(socket_path) -> socket.socket:
     client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
     client.settimeout(300)
 
     try:
         client.connect(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        client.close()
 
-        if args.timer != None and args.value != None:
-            message = f"{args.cmd} {args.timer} {args.value}"
-        elif args.timer == None:
-            message = f"{args.cmd}"
-        else:
-            message = f"{args.cmd} {args.timer}"
+        # Nothing is listening, start the daemon and send the command once
+        # it accepts connections
+        if not Autostart.start_daemon():
+            raise
 
-        if args.blocking:
-            message += " BLOCK"
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.settimeout(300)
+        client.connect(socket_path)
+
+    return client
+
+def send_daemon_cmd(args):
+    socket_path = Autostart.SOCKET_PATH
+
+    try:
+        client = connect(socket_path)
+
+        value = args.value
+        if args.task != None:
+            # The task is sent ahead of the value, which may contain anything
+            value = f"{args.task}{Protocol.SEP}{value or ''}"
 
-        client.sendall(message.encode())
+        message = Protocol.encode_request(0, args.cmd, timer=args.timer, value=value, block=args.blocking)
+        client.sendall(message)
 
         if args.blocking:
             state = DaemonStates.SynAck(client)
@@ -46,8 +55,8 @@ def send_daemon_cmd(args):
 
     except TimeoutError:
         TmuxHelper.message_create("Timeout while waiting for ACK from daemon")
-    except ConnectionRefusedError:
-        TmuxHelper.message_create("Socket is not listening. Has the daemon started?")
+    except (FileNotFoundError, ConnectionRefusedError):
+        TmuxHelper.message_create(f"Unable to start the daemon on {socket_path}, see {Runtime.LOG_PATH}")
     except Exception as e:
         TmuxHelper.message_create(f"{e.__class__.__name__}: Unable to connect to socket")
 
@@ -57,6 +66,7 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--timer', help="Specify the name of the timer the command refers to")
     parser.add_argument('--value', help="Specify the optional value for the command")
+    parser.add_argument('--task', help="Specify the task the command refers to, instead of the timer's current task")
     parser.add_argument('--blocking', action="store_true", help="Specify the optional value for the command")
     parser.add_argument('cmd', help="Specify the command you would like to perform")
     args = parser.parse_args()